@@ -1,7 +1,13 @@
-import google.generativeai as genai
+import functools
 import os
+import re
+import sqlite3
+import statistics
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
 import json
 import datetime
 
@@ -9,21 +15,107 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("API_KEY_GEMINI")
 
-genai.configure(api_key=GEMINI_API_KEY)
+# A local stub that answers GET ?q=...&num=... with Custom Search-style JSON
+# can stand in for the real search API.
+SEARCH_URL = os.getenv("SEARCH_URL")
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite3")
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 6 * 3600))
+SEARCH_CACHE_MAX_ENTRIES = 1000
+MAX_TOOL_ROUNDS = 5
+TOOL_WORKERS = 8
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 6000))
+HISTORY_RECENT_TURNS = 3
+TOOL_OUTPUT_MAX_CHARS = 1200
+SUMMARY_LINE_CHARS = 240
+CHARS_PER_TOKEN = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+LATENCY_LOG = os.getenv("LATENCY_LOG")
 
 GOOGLE_CSE_API_KEY = os.getenv("GOOGLE_CSE_API_KEY")
 GOOGLE_CSE_CX = os.getenv("GOOGLE_CSE_CX")
-if not GOOGLE_CSE_API_KEY or not GOOGLE_CSE_CX:
+if not SEARCH_URL and (not GOOGLE_CSE_API_KEY or not GOOGLE_CSE_CX):
     raise ValueError("Google Custom Search API keys (GOOGLE_CSE_API_KEY, GOOGLE_CSE_CX) not found in .env.")
 
-search_service = build("customsearch", "v1", developerKey=GOOGLE_CSE_API_KEY)
+# The Gemini SDK and the discovery client are slow to import, so both are set
+# up on first use instead of before the first prompt.
+@functools.cache
+def gemini():
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
 
-model = genai.GenerativeModel('gemini-pro')
-chat = model.start_chat(history=[])
+search_clients = threading.local()
 
-def Google Search_tool(query: str):
+def search_service():
+    # One client per thread: tool calls run concurrently and the underlying
+    # httplib2 connection is not thread-safe. The customsearch v1 document
+    # ships with google-api-python-client, so building one is a local read.
+    if not hasattr(search_clients, "service"):
+        from googleapiclient.discovery import build
+        search_clients.service = build("customsearch", "v1", developerKey=GOOGLE_CSE_API_KEY,
+                                       static_discovery=True)
+    return search_clients.service
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query.lower()).strip(" ?!.")
+
+class SearchCache:
+    # Persistent search results keyed by the normalized query, expired after
+    # a TTL and trimmed least-recently-used first.
+    def __init__(self, path, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS search_cache ("
+                        "query TEXT PRIMARY KEY, result TEXT, created REAL, accessed REAL)")
+        self.db.commit()
+
+    def get(self, query):
+        key = normalize_query(query)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT result, created FROM search_cache WHERE query = ?", (key,)).fetchone()
+            if row and now - row[1] < self.ttl:
+                self.db.execute("UPDATE search_cache SET accessed = ? WHERE query = ?", (now, key))
+                self.db.commit()
+                self.hits += 1
+                return row[0]
+            if row:
+                self.db.execute("DELETE FROM search_cache WHERE query = ?", (key,))
+                self.db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, query, result):
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?)",
+                            (normalize_query(query), result, now, now))
+            self.db.execute("DELETE FROM search_cache WHERE query IN (SELECT query FROM search_cache "
+                            "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self.db.commit()
+
+search_cache = SearchCache(SEARCH_CACHE_PATH)
+
+def cse_search(query):
+    return search_service().cse().list(q=query, cx=GOOGLE_CSE_CX, num=5).execute()
+
+def stub_search(query):
+    import requests
+    res = requests.get(SEARCH_URL, params={"q": query, "num": 5}, timeout=10)
+    res.raise_for_status()
+    return res.json()
+
+def google_search_tool(query: str, search=None):
+    cached = search_cache.get(query)
+    if cached is not None:
+        return cached
+    search = search or (stub_search if SEARCH_URL else cse_search)
     try:
-        res = search_service.cse().list(q=query, cx=GOOGLE_CSE_CX, num=5).execute()
+        res = search(query)
         if 'items' in res:
             results = []
             for item in res['items']:
@@ -32,7 +124,9 @@ def Google Search_tool(query: str):
                     'link': item.get('link'),
                     'snippet': item.get('snippet')
                 })
-            return json.dumps(results)
+            output = json.dumps(results)
+            search_cache.put(query, output)
+            return output
         else:
             return json.dumps({"error": "No search results found."})
     except Exception as e:
@@ -40,13 +134,13 @@ def Google Search_tool(query: str):
 
 tools = [
     {
-        "name": "Google Search",
+        "name": "google_search",
         "description": "Searches Google for real-time information.",
         "parameters": {
-            "type": "object",
+            "type": "OBJECT",
             "properties": {
                 "query": {
-                    "type": "string",
+                    "type": "STRING",
                     "description": "The search query."
                 }
             },
@@ -55,51 +149,205 @@ tools = [
     }
 ]
 
-def main():
+TOOL_FUNCTIONS = {
+    "google_search": lambda args: google_search_tool(args.get("query", "")),
+}
+
+def function_calls(response):
+    if not response.candidates:
+        return []
+    return [part.function_call for part in response.candidates[0].content.parts if part.function_call.name]
+
+def run_tool(function_call):
+    handler = TOOL_FUNCTIONS.get(function_call.name)
+    if handler is None:
+        return json.dumps({"error": f"Unknown tool: {function_call.name}"})
+    return handler(dict(function_call.args))
+
+# Shared across turns so its threads, and the search client each one holds,
+# outlive a single turn.
+tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+def run_function_calls(calls):
+    # Tool calls are network-bound, so all calls from one turn run together.
+    return list(tool_pool.map(run_tool, calls))
+
+def function_response_parts(calls, outputs):
+    protos = gemini().protos
+    return [
+        protos.Part(function_response=protos.FunctionResponse(
+            name=call.name, response={"content": output}))
+        for call, output in zip(calls, outputs)
+    ]
+
+def content_text(content):
+    return " ".join(part.text for part in content.parts if part.text)
+
+def estimate_tokens(contents):
+    protos = gemini().protos
+    return sum(protos.Content.pb(content).ByteSize() for content in contents) // CHARS_PER_TOKEN
+
+def split_turns(history):
+    # A turn starts at each user message with text; function responses are
+    # also sent as the user role but belong to the turn that requested them.
+    turns = []
+    for content in history:
+        if not turns or (content.role == "user" and content_text(content)):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+def summarize_turn(turn):
+    question = content_text(turn[0])
+    if question.startswith(SUMMARY_PREFIX):
+        return [line[2:] for line in question.splitlines()[1:]]
+    searches = [dict(part.function_call.args).get("query", "") for content in turn
+                for part in content.parts if part.function_call.name]
+    reply = content_text(turn[-1]) if turn[-1].role == "model" else ""
+    first_sentence = re.split(r"(?<=[.!?])\s+", reply.strip())[0]
+    line = f"User: {question} | Assistant: {first_sentence}"
+    if searches:
+        line += f" (searched: {', '.join(searches)})"
+    return [textwrap.shorten(line, SUMMARY_LINE_CHARS, placeholder=" ...")]
+
+def trim_tool_outputs(content):
+    protos = gemini().protos
+    parts = []
+    for part in content.parts:
+        output = part.function_response.response.get("content", "") if part.function_response.name else ""
+        if len(output) > TOOL_OUTPUT_MAX_CHARS:
+            part = protos.Part(function_response=protos.FunctionResponse(
+                name=part.function_response.name,
+                response={"content": output[:TOOL_OUTPUT_MAX_CHARS] + " ...[truncated]"}))
+        parts.append(part)
+    return protos.Content(role=content.role, parts=parts)
+
+def summary_contents(lines):
+    if not lines:
+        return []
+    protos = gemini().protos
+    text = "\n".join([SUMMARY_PREFIX] + [f"- {line}" for line in lines])
+    return [protos.Content(role="user", parts=[protos.Part(text=text)]),
+            protos.Content(role="model", parts=[protos.Part(text="Noted.")])]
+
+class HistoryManager:
+    # Keeps the last few turns verbatim and folds older ones into a single
+    # extractive summary so each request stays under the token budget.
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, recent_turns=HISTORY_RECENT_TURNS):
+        self.budget = budget
+        self.recent_turns = recent_turns
+        self.tokens = 0
+
+    def compact(self, chat):
+        turns = split_turns(chat.history)
+        summary = []
+        if turns and content_text(turns[0][0]).startswith(SUMMARY_PREFIX):
+            summary = summarize_turn(turns.pop(0))
+        split = max(len(turns) - self.recent_turns, 0)
+        for turn in turns[:split]:
+            summary += summarize_turn(turn)
+        recent = [[trim_tool_outputs(content) for content in turn] for turn in turns[split:-1]] + turns[-1:]
+
+        def kept():
+            return summary_contents(summary) + [content for turn in recent for content in turn]
+
+        while len(recent) > 1 and estimate_tokens(kept()) > self.budget:
+            summary += summarize_turn(recent.pop(0))
+        if estimate_tokens(kept()) > self.budget:
+            recent = [[trim_tool_outputs(content) for content in turn] for turn in recent]
+        while summary and estimate_tokens(kept()) > self.budget:
+            summary.pop(0)
+        chat.history = kept()
+        self.tokens = estimate_tokens(chat.history)
+
+def stream_text(response, timer):
+    printed = False
+    for chunk in response:
+        if not chunk.candidates:
+            continue
+        for part in chunk.candidates[0].content.parts:
+            if not part.text:
+                continue
+            if timer["first_token"] is None:
+                timer["first_token"] = time.perf_counter() - timer["start"]
+            if not printed:
+                print("Assistant: ", end="")
+                printed = True
+            print(part.text, end="", flush=True)
+    if printed:
+        print()
+    return printed
+
+def answer(chat, user_message):
+    timer = {"start": time.perf_counter(), "first_token": None}
+    replied = False
+    response = chat.send_message(user_message, tools=tools, stream=True)
+    rounds = 0
+    while True:
+        replied = stream_text(response, timer) or replied
+        calls = function_calls(response)
+        if not calls:
+            break
+        if rounds == MAX_TOOL_ROUNDS:
+            # Answer the outstanding calls so the history never keeps a call
+            # without its response; with no tools offered the model replies in text.
+            outputs = [json.dumps({"error": "tool round limit reached"})] * len(calls)
+            response = chat.send_message(function_response_parts(calls, outputs), stream=True)
+            replied = stream_text(response, timer) or replied
+            break
+        rounds += 1
+        for call in calls:
+            print(f"Assistant: (Calling tool: {call.name} with args: {dict(call.args)})")
+        outputs = run_function_calls(calls)
+        # Every result from this turn goes back in a single message.
+        response = chat.send_message(function_response_parts(calls, outputs), tools=tools, stream=True)
+    if not replied:
+        print("Assistant: (no reply)")
+    return timer["first_token"], time.perf_counter() - timer["start"]
+
+def record_latency(latencies, first_token, total, history_tokens):
+    latencies.append((first_token, total))
+    if LATENCY_LOG:
+        with open(LATENCY_LOG, "a") as f:
+            f.write(json.dumps({"time": datetime.datetime.now().isoformat(timespec="seconds"),
+                                "first_token": first_token, "total": total,
+                                "history_tokens": history_tokens}) + "\n")
+
+def latency_summary(latencies):
+    if not latencies:
+        return "no turns"
+    first_tokens = [first for first, _ in latencies if first is not None]
+    first = f"{statistics.median(first_tokens):.2f}s" if first_tokens else "n/a"
+    total = statistics.median(total for _, total in latencies)
+    return f"{len(latencies)} turns, median first token {first}, median turn {total:.2f}s"
+
+def main(chat=None):
+    history = HistoryManager()
+    latencies = []
     print("Welcome to the Gemini-powered Assistant!")
     print("Ask me anything (e.g., 'What's the weather in Mumbai?', 'Tell me about AI.', 'What is the current price of Bitcoin?').")
     print("Type 'exit' to quit.")
+    if chat is None:
+        # Import the SDK in the background while the user types the first question.
+        threading.Thread(target=gemini, daemon=True).start()
 
     while True:
         user_message = input("\nYou: ")
         if user_message.lower() == 'exit':
+            print(f"(Search cache: {search_cache.hits} hits, {search_cache.misses} misses)")
+            print(f"(Latency: {latency_summary(latencies)})")
             print("Assistant: Goodbye!")
             break
 
         try:
-            response = chat.send_message(
-                user_message,
-                tools=tools
-            )
-
-            if response.candidates and response.candidates[0].function_calls:
-                function_call = response.candidates[0].function_calls[0]
-                function_name = function_call.name
-                function_args = function_call.args
-
-                print(f"Assistant: (Calling tool: {function_name} with args: {function_args})")
-
-                if function_name == "Google Search":
-                    tool_output = Google Search_tool(function_args.get("query"))
-                else:
-                    tool_output = json.dumps({"error": f"Unknown tool: {function_name}"})
-
-                final_response = chat.send_message(
-                    genai.types.ToolCodeResponse(tool_code_results=[
-                        genai.types.ToolCodeResult(
-                            tool_name=function_name,
-                            content=tool_output
-                        )
-                    ])
-                )
-                print(f"Assistant: {final_response.text}")
-
-            else:
-                print(f"Assistant: {response.text}")
+            chat = chat or gemini().GenerativeModel('gemini-pro').start_chat(history=[])
+            first_token, total = answer(chat, user_message)
+            history.compact(chat)
+            record_latency(latencies, first_token, total, history.tokens)
 
         except Exception as e:
             print(f"Assistant: An error occurred: {e}")
             print("Please ensure your API keys are correct and you have internet connectivity.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
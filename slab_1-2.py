@@ -1,100 +1,914 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
+import argparse
+import hashlib
+import json
+import multiprocessing
+import queue
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import numpy as np
 import os
 
-try:
-    import kaggle
-except ImportError:
-    print("Kaggle API not found. Please install it using 'pip install kaggle' and configure your API key.")
-    print("Refer to https://www.kaggle.com/docs/api for instructions.")
-    exit()
-
 dataset_name = "altruistfv/abr-housing-data"
 download_path = "./housing_data"
 csv_file_name = "ABR_Housing_Data.csv"
+target_column = 'SalePrice'
+test_size = 0.2
+random_state = 42
+cache_path = "./housing_cache"
+# Only the names are needed to parse arguments; the classes live in
+# sklearn.preprocessing, which is imported when a preprocessor is built.
+scalers = {'standard': 'StandardScaler', 'robust': 'RobustScaler', 'minmax': 'MinMaxScaler'}
 
-if not os.path.exists(download_path):
-    os.makedirs(download_path)
 
-try:
-    print(f"Attempting to download dataset: {dataset_name} to {download_path}")
-    kaggle.api.dataset_download_files(dataset_name, path=download_path, unzip=True)
-    print("Dataset downloaded and unzipped successfully.")
-except Exception as e:
-    print(f"Error downloading dataset: {e}")
-    print("Please ensure you have configured your Kaggle API key correctly.")
-    exit()
+def download_dataset():
+    try:
+        import kaggle
+    except ImportError:
+        print("Kaggle API not found. Please install it using 'pip install kaggle' and configure your API key.")
+        print("Refer to https://www.kaggle.com/docs/api for instructions.")
+        exit()
 
-file_path = os.path.join(download_path, csv_file_name)
+    if not os.path.exists(download_path):
+        os.makedirs(download_path)
 
-try:
-    df = pd.read_csv(file_path)
-    print("\nCSV file loaded successfully!")
-    print("\nFirst 5 rows of the DataFrame:")
-    print(df.head())
-    print("\nDataFrame Info:")
-    df.info()
-except FileNotFoundError:
-    print(f"Error: The file '{csv_file_name}' was not found in '{download_path}'.")
-    exit()
-except Exception as e:
-    print(f"An error occurred while reading the CSV file: {e}")
-    exit()
+    try:
+        print(f"Attempting to download dataset: {dataset_name} to {download_path}")
+        kaggle.api.dataset_download_files(dataset_name, path=download_path, unzip=True)
+        print("Dataset downloaded and unzipped successfully.")
+    except Exception as e:
+        print(f"Error downloading dataset: {e}")
+        print("Please ensure you have configured your Kaggle API key correctly.")
+        exit()
+
+    return os.path.join(download_path, csv_file_name)
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_manifest():
+    try:
+        with open(os.path.join(cache_path, 'manifest.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def cached_dataset_path(digest):
+    return os.path.join(cache_path, 'datasets', digest, csv_file_name)
+
+
+def store_dataset(file_path):
+    digest = file_sha256(file_path)
+    cached_path = cached_dataset_path(digest)
+    if not os.path.exists(cached_path):
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        shutil.copy2(file_path, cached_path + '.tmp')
+        os.replace(cached_path + '.tmp', cached_path)
+    return digest
+
+
+def fetch_dataset(refresh=False):
+    manifest = read_manifest()
+    digest = manifest.get(dataset_name)
+    if digest and not refresh and os.path.exists(cached_dataset_path(digest)):
+        print(f"Using cached dataset {dataset_name} ({digest[:12]}); pass --refresh to download it again.")
+        return cached_dataset_path(digest), digest
+
+    digest = store_dataset(download_dataset())
+    manifest[dataset_name] = digest
+    os.makedirs(cache_path, exist_ok=True)
+    write_json(os.path.join(cache_path, 'manifest.json'), manifest)
+    return cached_dataset_path(digest), digest
+
+
+def sklearn_version():
+    # Read from the installed metadata: importing sklearn here would put its
+    # import time ahead of loading the data on every cached run.
+    from importlib import metadata
+    try:
+        return metadata.version('scikit-learn')
+    except metadata.PackageNotFoundError:
+        import sklearn
+        return sklearn.__version__
+
+
+def artifact_dir_for(digest):
+    config = json.dumps({
+        'target': target_column,
+        'test_size': test_size,
+        'random_state': random_state,
+        'pipeline': 'median/mode fillna, StandardScaler + OneHotEncoder, LinearRegression',
+        'sklearn': sklearn_version(),
+    }, sort_keys=True)
+    config_digest = hashlib.sha256(config.encode()).hexdigest()
+    return os.path.join(cache_path, 'artifacts', f"{digest[:16]}-{config_digest[:12]}")
+
+
+def save_artifacts(artifact_dir, model, fill_values, X_train, X_test, y_train, y_test,
+                   numerical_features, categorical_features):
+    import joblib
+    from scipy import sparse
+    tmp_dir = artifact_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    sparse.save_npz(os.path.join(tmp_dir, 'X_train.npz'), sparse.csr_matrix(X_train))
+    sparse.save_npz(os.path.join(tmp_dir, 'X_test.npz'), sparse.csr_matrix(X_test))
+    for name, series in (('y_train', y_train), ('y_test', y_test)):
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), series.to_numpy())
+        np.save(os.path.join(tmp_dir, f'{name}_index.npy'), series.index.to_numpy())
+    joblib.dump(model, os.path.join(tmp_dir, 'model.joblib'))
+    write_json(os.path.join(tmp_dir, 'meta.json'), {
+        'fill_values': fill_values,
+        'numerical_features': numerical_features,
+        'categorical_features': categorical_features,
+        'dense': not sparse.issparse(X_train),
+    })
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    os.replace(tmp_dir, artifact_dir)
+    print(f"Cached preprocessing and model in {artifact_dir}")
+
+
+def load_model(artifact_dir):
+    import joblib
+    try:
+        with open(os.path.join(artifact_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return dict(meta, model=joblib.load(os.path.join(artifact_dir, 'model.joblib')))
+
+
+def load_artifacts(artifact_dir):
+    import pandas as pd
+    from scipy import sparse
+    artifacts = load_model(artifact_dir)
+    if artifacts is None:
+        return None
+    for name in ('X_train', 'X_test'):
+        matrix = sparse.load_npz(os.path.join(artifact_dir, f'{name}.npz'))
+        artifacts[name] = matrix.toarray() if artifacts['dense'] else matrix
+    for name in ('y_train', 'y_test'):
+        artifacts[name] = pd.Series(np.load(os.path.join(artifact_dir, f'{name}.npy')),
+                                    index=np.load(os.path.join(artifact_dir, f'{name}_index.npy'), allow_pickle=True),
+                                    name=target_column)
+    return artifacts
+
+
+def load_data(file_path):
+    import pandas as pd
+    try:
+        df = pd.read_csv(file_path)
+        print("\nCSV file loaded successfully!")
+        print("\nFirst 5 rows of the DataFrame:")
+        print(df.head())
+        print("\nDataFrame Info:")
+        df.info()
+    except FileNotFoundError:
+        print(f"Error: The file '{file_path}' was not found.")
+        exit()
+    except Exception as e:
+        print(f"An error occurred while reading the CSV file: {e}")
+        exit()
+
+    if target_column not in df.columns:
+        print(f"Error: Target column '{target_column}' not found in the dataset.")
+        print("Available columns:", df.columns.tolist())
+        exit()
+    return df
 
-target_column = 'SalePrice'
-if target_column not in df.columns:
-    print(f"Error: Target column '{target_column}' not found in the dataset.")
-    print("Available columns:", df.columns.tolist())
-    exit()
 
-numerical_features = df.select_dtypes(include=np.number).columns.tolist()
-numerical_features.remove(target_column)
+def feature_columns(df):
+    numerical_features = df.select_dtypes(include=np.number).columns.tolist()
+    numerical_features.remove(target_column)
 
-if 'Id' in numerical_features:
-    numerical_features.remove('Id')
+    if 'Id' in numerical_features:
+        numerical_features.remove('Id')
 
-categorical_features = df.select_dtypes(include='object').columns.tolist()
+    categorical_features = df.select_dtypes(include='object').columns.tolist()
+    return numerical_features, categorical_features
 
-for col in numerical_features + categorical_features:
-    if df[col].isnull().any():
-        if df[col].dtype == 'object':
-            df[col].fillna(df[col].mode()[0], inplace=True)
+
+def impute(df, numerical_features, categorical_features):
+    # Fill values are kept for every feature so the scoring service can
+    # complete rows with fields the training data never had missing.
+    import pandas as pd
+    fill_values = {}
+    for col in numerical_features + categorical_features:
+        if col in categorical_features:
+            mode = df[col].mode()
+            if len(mode):
+                fill_values[col] = mode[0]
         else:
-            df[col].fillna(df[col].median(), inplace=True)
+            median = df[col].median()
+            fill_values[col] = 0.0 if pd.isna(median) else float(median)
+        if col in fill_values and df[col].isnull().any():
+            df[col] = df[col].fillna(fill_values[col])
+    return df, fill_values
+
+
+def print_report(mse, r2, sample_prediction_df):
+    rmse = np.sqrt(mse)
+
+    print(f"\nModel Performance:")
+    print(f"Mean Squared Error (MSE): {mse:.2f}")
+    print(f"Root Mean Squared Error (RMSE): {rmse:.2f}")
+    print(f"R-squared (R2): {r2:.2f}")
+
+    print("\nSample Actual vs. Predicted Prices (First 10):")
+    print(sample_prediction_df)
+
+
+def prepare_data(file_path):
+    df = load_data(file_path)
+    numerical_features, categorical_features = feature_columns(df)
+    df, fill_values = impute(df, numerical_features, categorical_features)
+    # sklearn is imported only once the data is in, so loading and its
+    # printout are not held up by the slowest import.
+    from sklearn.model_selection import train_test_split
+
+    X = df.drop(columns=[target_column])
+    y = df[target_column]
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    return X_train, X_test, y_train, y_test, numerical_features, categorical_features, fill_values
+
+
+def build_preprocessor(numerical_features, categorical_features, scaler='standard', dense=None, dtype=np.float64):
+    from sklearn import preprocessing
+    from sklearn.compose import ColumnTransformer
+    encoder_options = {'handle_unknown': 'ignore', 'dtype': dtype}
+    layout_options = {}
+    if dense is not None:
+        # Pin the output layout instead of letting its density decide.
+        encoder_options['sparse_output'] = not dense
+        layout_options['sparse_threshold'] = 0.0 if dense else 1.0
+    return ColumnTransformer(
+        transformers=[
+            ('num', getattr(preprocessing, scalers[scaler])(), numerical_features),
+            ('cat', preprocessing.OneHotEncoder(**encoder_options), categorical_features)
+        ], **layout_options)
+
+
+def train(file_path, artifact_dir=None):
+    import pandas as pd
+    artifacts = load_artifacts(artifact_dir) if artifact_dir else None
+    if artifacts is not None:
+        print(f"\nUsing cached preprocessing and model from {artifact_dir}")
+        model = artifacts['model']
+        y_test = artifacts['y_test']
+        y_pred = model.named_steps['regressor'].predict(artifacts['X_test'])
+    else:
+        (X_train, X_test, y_train, y_test,
+         numerical_features, categorical_features, fill_values) = prepare_data(file_path)
+        from sklearn.linear_model import LinearRegression
+        from sklearn.pipeline import Pipeline
+
+        preprocessor = build_preprocessor(numerical_features, categorical_features)
+
+        X_train_t = preprocessor.fit_transform(X_train, y_train)
+        X_test_t = preprocessor.transform(X_test)
+        regressor = LinearRegression().fit(X_train_t, y_train)
+        model = Pipeline(steps=[('preprocessor', preprocessor),
+                                ('regressor', regressor)])
+
+        y_pred = regressor.predict(X_test_t)
+
+        if artifact_dir:
+            save_artifacts(artifact_dir, model, fill_values, X_train_t, X_test_t, y_train, y_test,
+                           numerical_features, categorical_features)
+
+    from sklearn.metrics import mean_squared_error, r2_score
+    sample_prediction_df = pd.DataFrame({'Actual': y_test, 'Predicted': y_pred}).head(10)
+    print_report(mean_squared_error(y_test, y_pred), r2_score(y_test, y_pred), sample_prediction_df)
+    return model
+
+
+def candidate_grid(alphas):
+    candidates = [('linear', {})]
+    candidates += [('ridge', {'alpha': alpha}) for alpha in alphas]
+    candidates += [('lasso', {'alpha': alpha}) for alpha in alphas]
+    return candidates
+
+
+def make_regressor(name, params):
+    from sklearn.linear_model import Lasso, LinearRegression, Ridge
+    if name == 'ridge':
+        return Ridge(**params)
+    if name == 'lasso':
+        return Lasso(max_iter=10_000, **params)
+    return LinearRegression(**params)
+
+
+def evaluate_fold(fold, scaler, X, y, train_index, val_index, numerical_features, categorical_features,
+                  candidates):
+    from sklearn.metrics import mean_squared_error, r2_score
+    # The ColumnTransformer is fitted once per (fold, scaler) and its output
+    # is shared by every regressor candidate.
+    start = time.perf_counter()
+    preprocessor = build_preprocessor(numerical_features, categorical_features, scaler)
+    X_fit = preprocessor.fit_transform(X.iloc[train_index])
+    X_val = preprocessor.transform(X.iloc[val_index])
+    y_fit = y.iloc[train_index]
+    y_val = y.iloc[val_index]
+    transform_seconds = time.perf_counter() - start
+
+    results = []
+    for name, params in candidates:
+        start = time.perf_counter()
+        y_pred = make_regressor(name, params).fit(X_fit, y_fit).predict(X_val)
+        results.append({
+            'fold': fold,
+            'scaler': scaler,
+            'regressor': name,
+            'alpha': params.get('alpha', np.nan),
+            'rmse': float(np.sqrt(mean_squared_error(y_val, y_pred))),
+            'r2': float(r2_score(y_val, y_pred)),
+            'fit_seconds': time.perf_counter() - start,
+            'transform_seconds': transform_seconds,
+        })
+    return results
+
+
+def cross_validate(file_path, folds=5, alphas=(0.1, 1.0, 10.0, 100.0, 1000.0), scaler_names=tuple(scalers),
+                   n_jobs=-1):
+    import pandas as pd
+    (X_train, X_test, y_train, y_test,
+     numerical_features, categorical_features, fill_values) = prepare_data(file_path)
+    from joblib import Parallel, delayed
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import KFold
+    from sklearn.pipeline import Pipeline
+    candidates = candidate_grid(alphas)
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=random_state).split(X_train))
+
+    print(f"\nCross-validating {len(candidates) * len(scaler_names)} candidates over {folds} folds")
+    start = time.perf_counter()
+    fold_results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(fold, scaler, X_train, y_train, train_index, val_index,
+                               numerical_features, categorical_features, candidates)
+        for fold, (train_index, val_index) in enumerate(splits)
+        for scaler in scaler_names)
+    print(f"Cross-validation finished in {time.perf_counter() - start:.2f}s")
+
+    results = pd.DataFrame([row for rows in fold_results for row in rows])
+    summary = (results.groupby(['scaler', 'regressor', 'alpha'], dropna=False)
+               .agg(rmse=('rmse', 'mean'), rmse_std=('rmse', 'std'), r2=('r2', 'mean'),
+                    fit_seconds=('fit_seconds', 'mean'))
+               .sort_values('rmse')
+               .reset_index())
+    print("\nCross-Validation Results (mean over folds):")
+    print(summary.to_string(index=False))
+
+    best = summary.iloc[0]
+    params = {} if pd.isna(best['alpha']) else {'alpha': float(best['alpha'])}
+    print(f"\nBest candidate: {best['regressor']} {params} with {best['scaler']} scaling")
+    model = Pipeline(steps=[('preprocessor', build_preprocessor(numerical_features, categorical_features,
+                                                                best['scaler'])),
+                            ('regressor', make_regressor(best['regressor'], params))])
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    sample_prediction_df = pd.DataFrame({'Actual': y_test, 'Predicted': y_pred}).head(10)
+    print_report(mean_squared_error(y_test, y_pred), r2_score(y_test, y_pred), sample_prediction_df)
+    return summary
 
-X = df.drop(columns=[target_column])
-y = df[target_column]
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def test_mask(row_index, test_size=test_size, random_state=random_state):
+    # Stateless splitmix64 hash of the row number, so every pass over the
+    # file puts each row on the same side of the split.
+    z = row_index.astype(np.uint64) + np.uint64(random_state * 0x9E3779B97F4A7C15 % 2 ** 64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)) / float(2 ** 53) < test_size
 
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', StandardScaler(), numerical_features),
-        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
-    ])
 
-model = Pipeline(steps=[('preprocessor', preprocessor),
-                        ('regressor', LinearRegression())])
+class StreamingModel:
+    def __init__(self, numerical_features, categorical_features, fill_values, n_hash_features=2 ** 18):
+        from sklearn.feature_extraction import FeatureHasher
+        from sklearn.linear_model import SGDRegressor
+        from sklearn.preprocessing import StandardScaler
+        self.numerical_features = numerical_features
+        self.categorical_features = categorical_features
+        self.fill_values = fill_values
+        self.scaler = StandardScaler()
+        self.hasher = FeatureHasher(n_features=n_hash_features, input_type='string')
+        self.regressor = SGDRegressor(random_state=random_state)
+        self.y_mean = 0.0
+        self.y_scale = 1.0
 
-model.fit(X_train, y_train)
+    def prepare(self, chunk):
+        return chunk.fillna(self.fill_values)
 
-y_pred = model.predict(X_test)
+    def transform(self, chunk):
+        from scipy import sparse
+        numeric = self.scaler.transform(chunk[self.numerical_features].to_numpy(dtype=np.float64))
+        tokens = [col + '=' + chunk[col].astype(str).to_numpy(dtype=object) for col in self.categorical_features]
+        hashed = self.hasher.transform(zip(*tokens) if tokens else [[]] * len(chunk))
+        return sparse.hstack([sparse.csr_matrix(numeric), hashed], format='csr')
 
-mse = mean_squared_error(y_test, y_pred)
-rmse = np.sqrt(mse)
-r2 = r2_score(y_test, y_pred)
+    def partial_fit(self, chunk, y):
+        self.regressor.partial_fit(self.transform(chunk), (y - self.y_mean) / self.y_scale)
+
+    def predict(self, chunk):
+        return self.regressor.predict(self.transform(chunk)) * self.y_scale + self.y_mean
+
+
+def iter_split(file_path, chunksize, test):
+    import pandas as pd
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        chunk = chunk[test_mask(chunk.index.to_numpy()) == test]
+        if len(chunk):
+            yield chunk
+
+
+def scan_imputation(file_path, chunksize, median_sample=100_000):
+    import pandas as pd
+    rng = np.random.default_rng(random_state)
+    numerical_features = categorical_features = None
+    samples = {}
+    counts = {}
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        if numerical_features is None:
+            if target_column not in chunk.columns:
+                print(f"Error: Target column '{target_column}' not found in the dataset.")
+                print("Available columns:", chunk.columns.tolist())
+                exit()
+            numerical_features, categorical_features = feature_columns(chunk)
+        for col in numerical_features:
+            values = chunk[col].dropna().to_numpy(dtype=np.float64)
+            keyed = np.column_stack([rng.random(len(values)), values])
+            if col in samples:
+                keyed = np.concatenate([samples[col], keyed])
+            if len(keyed) > median_sample:
+                keyed = keyed[np.argpartition(keyed[:, 0], median_sample)[:median_sample]]
+            samples[col] = keyed
+        for col in categorical_features:
+            value_counts = chunk[col].value_counts()
+            counts[col] = counts[col].add(value_counts, fill_value=0) if col in counts else value_counts
+
+    fill_values = {}
+    for col in numerical_features:
+        fill_values[col] = float(np.median(samples[col][:, 1])) if len(samples[col]) else 0.0
+    for col in categorical_features:
+        if len(counts.get(col, ())):
+            # Ties resolve to the smallest label, as in Series.mode().
+            top = counts[col][counts[col] == counts[col].max()]
+            fill_values[col] = sorted(top.index)[0]
+    return numerical_features, categorical_features, fill_values
+
+
+def train_streaming(file_path, chunksize=100_000, epochs=5, n_hash_features=2 ** 18):
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    print(f"\nStreaming {file_path} in chunks of {chunksize} rows")
+    try:
+        numerical_features, categorical_features, fill_values = scan_imputation(file_path, chunksize)
+    except FileNotFoundError:
+        print(f"Error: The file '{file_path}' was not found.")
+        exit()
+
+    model = StreamingModel(numerical_features, categorical_features, fill_values, n_hash_features)
+
+    y_scaler = StandardScaler()
+    for chunk in iter_split(file_path, chunksize, test=False):
+        chunk = model.prepare(chunk)
+        model.scaler.partial_fit(chunk[numerical_features].to_numpy(dtype=np.float64))
+        y_scaler.partial_fit(chunk[[target_column]].to_numpy(dtype=np.float64))
+    model.y_mean = y_scaler.mean_[0]
+    model.y_scale = y_scaler.scale_[0]
+
+    rng = np.random.default_rng(random_state)
+    for epoch in range(epochs):
+        for chunk in iter_split(file_path, chunksize, test=False):
+            chunk = model.prepare(chunk).iloc[rng.permutation(len(chunk))]
+            model.partial_fit(chunk, chunk[target_column].to_numpy(dtype=np.float64))
+        print(f"Epoch {epoch + 1}/{epochs} done")
+
+    n = 0
+    sse = 0.0
+    y_mean = 0.0
+    y_m2 = 0.0
+    samples = []
+    for chunk in iter_split(file_path, chunksize, test=True):
+        chunk = model.prepare(chunk)
+        y = chunk[target_column].to_numpy(dtype=np.float64)
+        y_pred = model.predict(chunk)
+        sse += float(((y - y_pred) ** 2).sum())
+        chunk_mean = y.mean()
+        delta = chunk_mean - y_mean
+        total = n + len(y)
+        y_m2 += ((y - chunk_mean) ** 2).sum() + delta ** 2 * n * len(y) / total
+        y_mean += delta * len(y) / total
+        n = total
+        if sum(map(len, samples)) < 10:
+            samples.append(pd.DataFrame({'Actual': chunk[target_column], 'Predicted': y_pred}))
+
+    if n == 0:
+        print("Error: No rows fell into the test split.")
+        exit()
+    sample_prediction_df = pd.concat(samples).head(10)
+    print_report(sse / n, 1 - sse / y_m2, sample_prediction_df)
+    return model
+
+
+def default_artifact_dir():
+    digest = read_manifest().get(dataset_name)
+    return artifact_dir_for(digest) if digest else None
+
+
+class MicroBatcher:
+    def __init__(self, model, fill_values, max_batch_rows=256, max_wait_ms=5.0):
+        self.model = model
+        self.columns = list(model.named_steps['preprocessor'].feature_names_in_)
+        self.fill_values = fill_values
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=100_000)
+        self.rows = 0
+        self.batches = 0
+        self.first_submitted = None
+        self.last_done = None
+        # /stats is served from handler threads while the batcher appends.
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, rows):
+        future = Future()
+        submitted = time.perf_counter()
+        if self.first_submitted is None:
+            self.first_submitted = submitted
+        self.requests.put((rows, future, submitted))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_rows:
+                try:
+                    item = self.requests.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        import pandas as pd
+        rows = [row for request_rows, _, _ in batch for row in request_rows]
+        try:
+            frame = pd.DataFrame.from_records(rows, columns=self.columns).fillna(self.fill_values)
+            predictions = self.model.predict(frame)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One bad row must not fail its neighbours: score each request alone.
+            for item in batch:
+                self._score([item])
+            return
+        done = time.perf_counter()
+        offset = 0
+        for request_rows, future, submitted in batch:
+            future.set_result(predictions[offset:offset + len(request_rows)].tolist())
+            offset += len(request_rows)
+        with self.lock:
+            self.latencies.extend(done - submitted for _, _, submitted in batch)
+            self.rows += len(rows)
+            self.batches += 1
+            self.last_done = done
+
+    def stats(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            rows, batches, last_done = self.rows, self.batches, self.last_done
+        elapsed = last_done - self.first_submitted if last_done else 0
+        requests = len(latencies)
+        latencies = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        return {
+            'requests': requests,
+            'rows': rows,
+            'batches': batches,
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def request_rows(payload):
+    if isinstance(payload, dict) and 'rows' in payload:
+        payload = payload['rows']
+    return payload if isinstance(payload, list) else [payload]
+
+
+def serve_http(batcher, host, port):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, batcher.stats())
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._reply(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                rows = request_rows(json.loads(self.rfile.read(length)))
+                self._reply(200, {'predictions': batcher.submit(rows).result(timeout=30)})
+            except Exception as e:
+                self._reply(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    class ScoringServer(ThreadingHTTPServer):
+        request_queue_size = 1024
+
+    server = ScoringServer((host, port), ScoringHandler)
+    print(f"Scoring on http://{host}:{port}/predict (stats at /stats). Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def serve_stdin(batcher, max_pending=10_000):
+    pending = queue.Queue(maxsize=max_pending)
+
+    def write_results():
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            try:
+                for prediction in future.result():
+                    sys.stdout.write(json.dumps({'prediction': prediction}) + '\n')
+            except Exception as e:
+                sys.stdout.write(json.dumps({'error': str(e)}) + '\n')
+            if pending.empty():
+                sys.stdout.flush()
+
+    writer = threading.Thread(target=write_results)
+    writer.start()
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                rows = request_rows(json.loads(line))
+            except ValueError as e:
+                # Reported in order with the other results instead of stopping the stream.
+                future = Future()
+                future.set_exception(ValueError(f"invalid JSON: {e}"))
+                pending.put(future)
+                continue
+            pending.put(batcher.submit(rows))
+    finally:
+        pending.put(None)
+        writer.join()
+    sys.stdout.flush()
+
+
+def serve(source, model_dir, host='127.0.0.1', port=8000, max_batch_rows=256, max_wait_ms=5.0):
+    model_dir = model_dir or default_artifact_dir()
+    # Scoring needs only the fitted pipeline, not the cached training matrices.
+    artifacts = load_model(model_dir) if model_dir else None
+    if artifacts is None:
+        print("Error: No trained model found. Train once without --serve or pass --model.", file=sys.stderr)
+        exit()
+    print(f"Loaded model from {model_dir}", file=sys.stderr)
+    batcher = MicroBatcher(artifacts['model'], artifacts['fill_values'], max_batch_rows, max_wait_ms)
+    if source == 'http':
+        serve_http(batcher, host, port)
+    else:
+        serve_stdin(batcher)
+    print(f"Scoring stats: {json.dumps(batcher.stats())}", file=sys.stderr)
+
+
+def make_synthetic_housing(rows, file_path, seed=0, block=1_000_000):
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    neighborhoods = np.array([f'Neighborhood{i:02d}' for i in range(25)])
+    styles = np.array(['1Story', '2Story', '1.5Fin', '1.5Unf', 'SFoyer', 'SLvl', '2.5Unf', '2.5Fin'])
+    conditions = np.array(['Normal', 'Abnorml', 'Partial', 'AdjLand', 'Alloca', 'Family'])
+    # Prefixed so read_csv keeps it a string (categorical) column, as real ZIPs should be.
+    zip_codes = np.array([f'ZIP{i:05d}' for i in rng.choice(100_000, 2_000, replace=False)])
+    street_count = max(rows // 20, 10)
+    neighborhood_effect = rng.normal(0, 20_000, len(neighborhoods))
+
+    with open(file_path, 'w', newline='') as f:
+        for start in range(0, rows, block):
+            n = min(block, rows - start)
+            neighborhood = rng.integers(0, len(neighborhoods), n)
+            df = pd.DataFrame({
+                'Id': np.arange(start + 1, start + n + 1),
+                'LotArea': rng.lognormal(9.1, 0.5, n).round(),
+                'GrLivArea': rng.normal(1500, 500, n).clip(300).round(),
+                'TotalBsmtSF': rng.normal(1000, 400, n).clip(0).round(),
+                'OverallQual': rng.integers(1, 11, n),
+                'YearBuilt': rng.integers(1880, 2011, n),
+                'GarageCars': rng.integers(0, 5, n).astype(float),
+                'Neighborhood': neighborhoods[neighborhood],
+                'HouseStyle': styles[rng.integers(0, len(styles), n)],
+                'SaleCondition': conditions[rng.integers(0, len(conditions), n)],
+                'ZipCode': zip_codes[rng.integers(0, len(zip_codes), n)],
+                'Street': 'Street' + pd.Series(rng.integers(0, street_count, n)).astype(str),
+            })
+            df[target_column] = (20_000 + df['GrLivArea'] * 70 + df['OverallQual'] * 12_000
+                                 + (df['YearBuilt'] - 1880) * 250 + df['GarageCars'] * 8_000
+                                 + neighborhood_effect[neighborhood] + rng.normal(0, 20_000, n)).round()
+            for col in ('LotArea', 'GarageCars', 'TotalBsmtSF'):
+                df.loc[rng.random(n) < 0.05, col] = np.nan
+            df.loc[rng.random(n) < 0.02, 'HouseStyle'] = np.nan
+            df.to_csv(f, index=False, header=start == 0)
+    return file_path
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def bench_run(file_path, rows, dense, dtype, max_dense_bytes):
+    import pandas as pd
+    from scipy import sparse
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import r2_score
+    from sklearn.model_selection import train_test_split
+    result = {'rows': rows, 'layout': 'dense' if dense else 'sparse', 'dtype': dtype}
+    dtype = np.dtype(dtype)
+
+    start = time.perf_counter()
+    df = pd.read_csv(file_path)
+    result['load_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    numerical_features, categorical_features = feature_columns(df)
+    df, _ = impute(df, numerical_features, categorical_features)
+    result['impute_s'] = time.perf_counter() - start
+
+    X = df.drop(columns=[target_column]).astype({col: dtype for col in numerical_features})
+    y = df[target_column]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+    n_features = len(numerical_features) + int(sum(X_train[col].nunique() for col in categorical_features))
+    if dense and len(X_train) * n_features * dtype.itemsize > max_dense_bytes:
+        result['skipped'] = f"dense matrix needs {len(X_train) * n_features * dtype.itemsize / 1e9:.1f} GB"
+        result['peak_rss_mb'] = peak_rss_mb()
+        return result
+
+    start = time.perf_counter()
+    preprocessor = build_preprocessor(numerical_features, categorical_features, dense=dense, dtype=dtype)
+    X_train_t = preprocessor.fit_transform(X_train)
+    X_test_t = preprocessor.transform(X_test)
+    result['encode_s'] = time.perf_counter() - start
+
+    nnz = X_train_t.nnz if sparse.issparse(X_train_t) else np.count_nonzero(X_train_t)
+    result['n_features'] = X_train_t.shape[1]
+    result['density'] = nnz / (X_train_t.shape[0] * X_train_t.shape[1])
+    result['matrix_dtype'] = str(X_train_t.dtype)
+
+    start = time.perf_counter()
+    regressor = LinearRegression().fit(X_train_t, y_train)
+    result['fit_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = regressor.predict(X_test_t)
+    result['predict_s'] = time.perf_counter() - start
+
+    result['r2'] = float(r2_score(y_test, y_pred))
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_benchmark(sizes, data_dir='bench_data', out_path='bench_results.jsonl', max_dense_gb=4.0):
+    os.makedirs(data_dir, exist_ok=True)
+    variants = [(dense, dtype) for dense in (False, True) for dtype in ('float64', 'float32')]
+    # Every run gets a freshly spawned process so peak RSS covers that run only.
+    context = multiprocessing.get_context('spawn')
+    with open(out_path, 'a') as out:
+        for rows in sizes:
+            file_path = os.path.join(data_dir, f'housing-v2-{rows}.csv')
+            if not os.path.exists(file_path):
+                start = time.perf_counter()
+                make_synthetic_housing(rows, file_path)
+                print(f"Generated {file_path} in {time.perf_counter() - start:.1f}s")
+            for dense, dtype in variants:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    try:
+                        result = pool.submit(bench_run, file_path, rows, dense, dtype,
+                                             max_dense_gb * 1e9).result()
+                    except Exception as e:
+                        result = {'rows': rows, 'layout': 'dense' if dense else 'sparse', 'dtype': dtype,
+                                  'error': repr(e)}
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+                stages = ' '.join(f"{key[:-2]}={result[key]:.3f}s" for key in
+                                  ('load_s', 'impute_s', 'encode_s', 'fit_s', 'predict_s') if key in result)
+                extra = result.get('skipped') or result.get('error') or \
+                    f"density={result['density']:.4f} features={result['n_features']}"
+                print(f"{rows:>10} {result['layout']:>6} {dtype:>7} {stages} "
+                      f"peak_rss={result.get('peak_rss_mb', 0):.0f}MB {extra}")
+    print(f"\nBenchmark results appended to {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a linear regression model on the ABR housing data.")
+    parser.add_argument('--csv', help="use this local CSV instead of downloading the dataset")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always download and refit instead of using the artifact cache")
+    parser.add_argument('--refresh', action='store_true',
+                        help="download the dataset again even if a cached copy exists")
+    parser.add_argument('--stream', action='store_true',
+                        help="train out of core: read the CSV in chunks and fit an incremental model")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per chunk in stream mode")
+    parser.add_argument('--epochs', type=int, default=5, help="passes over the training rows in stream mode")
+    parser.add_argument('--hash-features', type=int, default=2 ** 18,
+                        help="width of the hashed categorical encoding in stream mode")
+    parser.add_argument('--serve', choices=['http', 'stdin'],
+                        help="score rows with the cached model over HTTP or from JSON lines on stdin")
+    parser.add_argument('--model', help="artifact directory to serve (default: the cached model for the dataset)")
+    parser.add_argument('--host', default='127.0.0.1', help="address for --serve http")
+    parser.add_argument('--port', type=int, default=8000, help="port for --serve http")
+    parser.add_argument('--max-batch-rows', type=int, default=256, help="rows scored per predict call")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="longest a request waits for a batch to fill")
+    parser.add_argument('--cv', type=int, metavar='K',
+                        help="run K-fold cross-validation over the regressor and scaler grid")
+    parser.add_argument('--alphas', type=float, nargs='+', default=[0.1, 1.0, 10.0, 100.0, 1000.0],
+                        help="Ridge/Lasso regularisation strengths for --cv")
+    parser.add_argument('--scalers', nargs='+', choices=list(scalers), default=list(scalers),
+                        help="numeric scalers tried by --cv")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="parallel workers for --cv (-1 uses all cores)")
+    parser.add_argument('--bench', action='store_true',
+                        help="benchmark each pipeline stage on synthetic housing data of several sizes")
+    parser.add_argument('--bench-sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000],
+                        help="row counts for --bench")
+    parser.add_argument('--bench-dir', default='bench_data', help="where --bench keeps its generated CSVs")
+    parser.add_argument('--bench-out', default='bench_results.jsonl', help="JSON lines file for --bench results")
+    parser.add_argument('--bench-max-dense-gb', type=float, default=4.0,
+                        help="skip dense runs whose encoded matrix would exceed this size")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench_sizes, args.bench_dir, args.bench_out, args.bench_max_dense_gb)
+    elif args.serve:
+        serve(args.serve, args.model, args.host, args.port, args.max_batch_rows, args.max_wait_ms)
+    elif args.stream or args.cv:
+        file_path = args.csv or (download_dataset() if args.no_cache else fetch_dataset(args.refresh)[0])
+        if args.stream:
+            train_streaming(file_path, args.chunksize, args.epochs, args.hash_features)
+        else:
+            cross_validate(file_path, args.cv, args.alphas, args.scalers, args.n_jobs)
+    elif args.no_cache:
+        train(args.csv or download_dataset())
+    else:
+        if args.csv:
+            try:
+                file_path, digest = args.csv, file_sha256(args.csv)
+            except FileNotFoundError:
+                print(f"Error: The file '{args.csv}' was not found.")
+                exit()
+        else:
+            file_path, digest = fetch_dataset(args.refresh)
+        train(file_path, artifact_dir_for(digest))
 
-print(f"\nModel Performance:")
-print(f"Mean Squared Error (MSE): {mse:.2f}")
-print(f"Root Mean Squared Error (RMSE): {rmse:.2f}")
-print(f"R-squared (R2): {r2:.2f}")
 
-sample_prediction_df = pd.DataFrame({'Actual': y_test, 'Predicted': y_pred}).head(10)
-print("\nSample Actual vs. Predicted Prices (First 10):")
-print(sample_prediction_df)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
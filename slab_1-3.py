@@ -1,5 +1,41 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
 import numpy as np
 
+try:
+    import scipy.linalg as sla
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spla
+except ImportError:
+    sla = sp = spla = None
+
+SUMMARY_THRESHOLD = 1000
+# Element type used for computation; float32 halves memory and roughly
+# doubles BLAS throughput where the bench mode shows its error is acceptable.
+COMPUTE_DTYPE = np.dtype(os.environ.get('MATRIX_DTYPE', 'float64'))
+RAW_EXTENSIONS = ('.bin', '.raw', '.dat')
+MEMORY_FRACTION = 0.25
+LARGE_DETERMINANT = 2000
+# Inputs below SPARSE_DENSITY (and at least SPARSE_MIN_SIZE elements) are
+# stored as CSR; sparse results above DENSE_DENSITY are converted back.
+# Sparse LU suffers from fill-in well before products do, so it has its own
+# lower cut-over. Tuned with the sparse-bench mode.
+SPARSE_DENSITY = 0.03
+SPARSE_LU_DENSITY = 0.002
+SPARSE_MIN_SIZE = 10_000
+DENSE_DENSITY = 0.25
+
 def get_matrix_input(prompt):
     while True:
         try:
@@ -23,25 +59,627 @@ def get_matrix_input(prompt):
                             break
                     except ValueError:
                         print("Invalid input. Please enter numbers separated by spaces.")
-            return np.array(matrix)
+            return np.array(matrix, dtype=COMPUTE_DTYPE)
         except ValueError:
             print("Invalid input for dimensions. Please enter integers.")
 
 def display_matrix(matrix, name="Matrix"):
     print(f"\n--- {name} ---")
-    print(matrix)
-    print("-" * (len(str(matrix).splitlines()[0])))
+    if is_sparse(matrix):
+        print(f"[{' x '.join(map(str, matrix.shape))} sparse {matrix.format} {matrix.dtype}, "
+              f"{matrix.nnz} non-zeros ({density(matrix):.3%})]")
+        if np.prod(matrix.shape) > SUMMARY_THRESHOLD:
+            return
+        matrix = matrix.toarray()
+    # array2string only reads the edge items of large (possibly memory-mapped)
+    # arrays, and the text is built once for both the matrix and the rule.
+    text = np.array2string(np.asarray(matrix), threshold=SUMMARY_THRESHOLD, edgeitems=3)
+    print(text)
+    if np.size(matrix) > SUMMARY_THRESHOLD:
+        print(f"[{' x '.join(map(str, np.shape(matrix)))} {matrix.dtype}, summarised]")
+    print("-" * len(text.splitlines()[0]))
+
+def is_sparse(matrix):
+    return sp is not None and sp.issparse(matrix)
+
+def density(matrix):
+    size = np.prod(np.shape(matrix))
+    if not size:
+        return 0.0
+    nonzeros = matrix.nnz if is_sparse(matrix) else np.count_nonzero(matrix)
+    return nonzeros / size
+
+def choose_format(matrix):
+    # Picks CSR for large, mostly-zero inputs and dense storage otherwise.
+    if sp is None or np.ndim(matrix) != 2 or np.prod(np.shape(matrix)) < SPARSE_MIN_SIZE:
+        return matrix
+    sparse = density(matrix) < SPARSE_DENSITY
+    if is_sparse(matrix):
+        return matrix.tocsr() if sparse else matrix.toarray()
+    return sp.csr_array(matrix) if sparse else matrix
+
+def finish_result(result):
+    # Sparse results that filled in are cheaper to keep dense from here on.
+    if is_sparse(result) and density(result) > DENSE_DENSITY:
+        return result.toarray()
+    return result
+
+def available_memory():
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 2 * 1024 ** 3
+
+def pick_tile_size(itemsize, workers=1, memory=None):
+    # Each worker holds one A tile, one B tile and its output accumulator.
+    budget = (memory or available_memory()) * MEMORY_FRACTION / workers
+    tile = int(np.sqrt(budget / (3 * itemsize)))
+    return max(256, min(8192, tile - tile % 64))
+
+def open_result(out_path, shape, dtype):
+    return np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=shape)
+
+def blocked_multiply(matrix_a, matrix_b, out_path, tile=None, workers=None, dtype=None):
+    rows, inner = matrix_a.shape
+    cols = matrix_b.shape[1]
+    dtype = np.dtype(dtype or np.result_type(matrix_a.dtype, matrix_b.dtype))
+    workers = workers or os.cpu_count() or 1
+    tile = tile or pick_tile_size(dtype.itemsize, workers)
+    result = open_result(out_path, (rows, cols), dtype)
+
+    def compute_tile(i, j):
+        acc = np.zeros((min(tile, rows - i), min(tile, cols - j)), dtype=dtype)
+        for k in range(0, inner, tile):
+            # BLAS releases the GIL, so tiles run concurrently on the pool.
+            acc += (np.asarray(matrix_a[i:i + tile, k:k + tile], dtype=dtype)
+                    @ np.asarray(matrix_b[k:k + tile, j:j + tile], dtype=dtype))
+        result[i:i + tile, j:j + tile] = acc
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(compute_tile, i, j)
+                       for i, j in product(range(0, rows, tile), range(0, cols, tile))]:
+            future.result()
+    result.flush()
+    return result
+
+def blocked_elementwise(ufunc, matrix_a, matrix_b, out_path, block_rows=None, dtype=None):
+    rows, cols = matrix_a.shape
+    dtype = np.dtype(dtype or np.result_type(matrix_a.dtype, matrix_b.dtype))
+    block_rows = block_rows or max(1, int(available_memory() * MEMORY_FRACTION // (3 * cols * dtype.itemsize)))
+    result = open_result(out_path, (rows, cols), dtype)
+    for i in range(0, rows, block_rows):
+        ufunc(matrix_a[i:i + block_rows], matrix_b[i:i + block_rows], out=result[i:i + block_rows])
+    result.flush()
+    return result
+
+def blocked_transpose(matrix, out_path, tile=None, dtype=None):
+    rows, cols = matrix.shape
+    dtype = np.dtype(dtype or matrix.dtype)
+    tile = tile or pick_tile_size(dtype.itemsize)
+    result = open_result(out_path, (cols, rows), dtype)
+    for i, j in product(range(0, rows, tile), range(0, cols, tile)):
+        result[j:j + tile, i:i + tile] = matrix[i:i + tile, j:j + tile].T
+    result.flush()
+    return result
+
+def add_matrices(matrix_a, matrix_b, out_path=None, dtype=None, **blocking):
+    if matrix_a.shape != matrix_b.shape:
+        raise ValueError("Matrices must have the same dimensions for addition.")
+    if out_path:
+        return blocked_elementwise(np.add, matrix_a, matrix_b, out_path, dtype=dtype)
+    if is_sparse(matrix_a) or is_sparse(matrix_b):
+        return finish_result(matrix_a + matrix_b)
+    return matrix_a + matrix_b
+
+def subtract_matrices(matrix_a, matrix_b, out_path=None, dtype=None, **blocking):
+    if matrix_a.shape != matrix_b.shape:
+        raise ValueError("Matrices must have the same dimensions for subtraction.")
+    if out_path:
+        return blocked_elementwise(np.subtract, matrix_a, matrix_b, out_path, dtype=dtype)
+    if is_sparse(matrix_a) or is_sparse(matrix_b):
+        return finish_result(matrix_a - matrix_b)
+    return matrix_a - matrix_b
+
+def multiply_matrices(matrix_a, matrix_b, out_path=None, tile=None, workers=None, dtype=None):
+    if matrix_a.shape[1] != matrix_b.shape[0]:
+        raise ValueError("Number of columns in Matrix A must equal number of rows in Matrix B for multiplication.")
+    if out_path:
+        return blocked_multiply(matrix_a, matrix_b, out_path, tile, workers, dtype)
+    if is_sparse(matrix_a) or is_sparse(matrix_b):
+        return finish_result(matrix_a @ matrix_b)
+    return np.dot(matrix_a, matrix_b)
+
+def transpose_matrix(matrix, out_path=None, tile=None, dtype=None, **blocking):
+    if out_path:
+        return blocked_transpose(matrix, out_path, tile, dtype)
+    return matrix.T
+
+class FactorizationCache:
+    # LRU of matrix factorizations keyed by a content hash, bounded by the
+    # bytes held. Hashing is O(n^2), so repeated work on the same operand
+    # skips the O(n^3) factorization.
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or int(min(available_memory() * MEMORY_FRACTION, 1024 ** 3))
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, matrix, kind):
+        digest = hashlib.blake2b(digest_size=16)
+        if is_sparse(matrix):
+            matrix = matrix.tocsr()
+            matrix.sum_duplicates()
+            parts = [matrix.data, matrix.indices, matrix.indptr]
+        else:
+            parts = [matrix]
+        for part in parts:
+            digest.update(np.ascontiguousarray(part).data)
+        return (kind, is_sparse(matrix), matrix.shape, matrix.dtype.str, digest.hexdigest())
+
+    def get(self, matrix, kind):
+        key = self.key(matrix, kind)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+        self.misses += 1
+        factors = FACTORIZERS[kind](matrix if is_sparse(matrix) else np.asarray(matrix))
+        nbytes = sum(factor_nbytes(part) for part in factors[1])
+        self.entries[key] = (factors, nbytes)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+        return factors
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+def factor_nbytes(part):
+    if spla is not None and isinstance(part, spla.SuperLU):
+        return sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (part.L, part.U))
+    return np.asarray(part).nbytes
+
+def factorize_square(matrix):
+    if is_sparse(matrix) and density(matrix) > SPARSE_LU_DENSITY:
+        matrix = matrix.toarray()
+    if is_sparse(matrix):
+        try:
+            return 'splu', (spla.splu(sp.csc_matrix(matrix)),)
+        except RuntimeError:
+            return 'singular', ()
+    if sla is None:
+        # Without SciPy there is no reusable LU, so keep the inverse and
+        # slogdet instead; later solves are still a single O(n^2) product.
+        sign, logdet = np.linalg.slogdet(matrix)
+        inverse = np.linalg.inv(matrix) if sign != 0 else np.full(matrix.shape, np.nan)
+        return 'inverse', (inverse, np.array([sign, logdet]))
+    if np.array_equal(matrix, matrix.T):
+        try:
+            return 'cholesky', sla.cho_factor(matrix, check_finite=False)
+        except np.linalg.LinAlgError:
+            pass
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', sla.LinAlgWarning)
+        return 'lu', sla.lu_factor(matrix, check_finite=False)
+
+def factorize_rank(matrix):
+    if is_sparse(matrix):
+        # SciPy has no rank-revealing sparse factorization.
+        matrix = matrix.toarray()
+    if sla is None:
+        return 'svd', (np.linalg.svd(matrix, compute_uv=False),)
+    r = sla.qr(matrix, mode='r', pivoting=True, check_finite=False)[0]
+    return 'qr', (np.abs(np.diag(r)),)
+
+FACTORIZERS = {'square': factorize_square, 'rank': factorize_rank}
+factorizations = FactorizationCache()
+
+def require_square(matrix, operation):
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError(f"{operation} can only be calculated for square matrices.")
+
+def permutation_sign(perm):
+    seen = np.zeros(len(perm), dtype=bool)
+    cycles = 0
+    for start in range(len(perm)):
+        if not seen[start]:
+            cycles += 1
+            while not seen[start]:
+                seen[start] = True
+                start = perm[start]
+    return -1 if (len(perm) - cycles) % 2 else 1
+
+def splu_log_determinant(lu):
+    # Pr A Pc = L U with a unit-diagonal L.
+    diagonal = lu.U.diagonal()
+    if np.any(diagonal == 0):
+        return 0.0, float('-inf')
+    sign = permutation_sign(lu.perm_r) * permutation_sign(lu.perm_c) * np.prod(np.sign(diagonal))
+    return float(sign), float(np.sum(np.log(np.abs(diagonal))))
+
+def log_determinant(matrix, cache=factorizations):
+    require_square(matrix, "Determinant")
+    kind, factors = cache.get(matrix, 'square')
+    if kind == 'singular':
+        return 0.0, float('-inf')
+    if kind == 'splu':
+        return splu_log_determinant(factors[0])
+    if kind == 'inverse':
+        sign, logdet = factors[1]
+        return float(sign), float(logdet)
+    diagonal = np.diag(factors[0])
+    if kind == 'cholesky':
+        return 1.0, float(2 * np.sum(np.log(diagonal)))
+    if np.any(diagonal == 0):
+        return 0.0, float('-inf')
+    swaps = np.count_nonzero(factors[1] != np.arange(len(factors[1])))
+    sign = (-1) ** swaps * np.prod(np.sign(diagonal))
+    return float(sign), float(np.sum(np.log(np.abs(diagonal))))
+
+def solve_system(matrix, rhs, cache=factorizations):
+    require_square(matrix, "A linear system")
+    if rhs.shape[0] != matrix.shape[0]:
+        raise ValueError("Right-hand side must have as many rows as the matrix.")
+    if is_sparse(rhs):
+        rhs = rhs.toarray()
+    kind, factors = cache.get(matrix, 'square')
+    if kind == 'singular':
+        raise np.linalg.LinAlgError("Singular matrix")
+    if kind == 'splu':
+        return factors[0].solve(np.asarray(rhs, dtype=np.result_type(matrix.dtype, np.float64)))
+    if kind == 'cholesky':
+        return sla.cho_solve(factors, rhs, check_finite=False)
+    if kind == 'lu':
+        if np.any(np.diag(factors[0]) == 0):
+            raise np.linalg.LinAlgError("Singular matrix")
+        return sla.lu_solve(factors, rhs, check_finite=False)
+    if factors[1][0] == 0:
+        raise np.linalg.LinAlgError("Singular matrix")
+    return factors[0] @ rhs
+
+def inverse_matrix(matrix, cache=factorizations):
+    require_square(matrix, "Inverse")
+    return solve_system(matrix, np.eye(matrix.shape[0], dtype=np.result_type(matrix.dtype, np.float64)), cache)
+
+def matrix_rank_of(matrix, tol=None, cache=factorizations):
+    magnitudes = cache.get(matrix, 'rank')[1][0]
+    if magnitudes.size == 0:
+        return 0
+    if tol is None:
+        tol = magnitudes.max() * max(matrix.shape) * np.finfo(np.result_type(matrix.dtype, np.float32)).eps
+    return int(np.count_nonzero(magnitudes > tol))
+
+def format_determinant(sign, logdet):
+    with np.errstate(over='ignore', under='ignore'):
+        value = sign * np.exp(logdet)
+    if np.isfinite(value) and (value != 0 or sign == 0):
+        return f"{value:.4f}"
+    return f"{'-' if sign < 0 else ''}exp({logdet:.4f})"
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(\.T)\b|([A-Za-z_]\w*)|(\S))")
+
+class Node:
+    # Expression DAG node. Parsed trees use 'leaf', 'T', 'neg', '@', '+' and
+    # '-'; planned trees use 'leaf' (with the transpose folded into a view),
+    # n-ary 'chain' products and n-ary signed 'sum's.
+    def __init__(self, op, children=(), name=None, transposed=False, signs=None):
+        self.op = op
+        self.children = list(children)
+        self.name = name
+        self.transposed = transposed
+        self.signs = signs
+        self.shape = None
+        self.split = None
+        self.key = None
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.rstrip()):
+        transpose, name, symbol = match.groups()
+        if symbol and symbol not in '@+-()':
+            raise ValueError(f"Unexpected character {symbol!r} in expression.")
+        tokens.append(transpose or name or symbol)
+    return tokens
+
+def parse_expression(text):
+    tokens = tokenize(text)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_sum():
+        node = parse_product()
+        while peek() in ('+', '-'):
+            node = Node(take(), [node, parse_product()])
+        return node
+
+    def parse_product():
+        node = parse_unary()
+        while peek() == '@':
+            take()
+            node = Node('@', [node, parse_unary()])
+        return node
+
+    def parse_unary():
+        if peek() == '-':
+            take()
+            return Node('neg', [parse_unary()])
+        return parse_postfix()
+
+    def parse_postfix():
+        token = take() if peek() else None
+        if token == '(':
+            node = parse_sum()
+            if peek() != ')':
+                raise ValueError("Missing closing parenthesis in expression.")
+            take()
+        elif token and (token[0].isalpha() or token[0] == '_'):
+            node = Node('leaf', name=token)
+        else:
+            raise ValueError(f"Expected a matrix name or '(' but found {token or 'end of expression'!r}.")
+        while peek() == '.T':
+            take()
+            node = Node('T', [node])
+        return node
+
+    tree = parse_sum()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r} in expression.")
+    return tree
+
+def expression_names(tree):
+    if tree.op == 'leaf':
+        return [tree.name]
+    names = []
+    for child in tree.children:
+        names += [name for name in expression_names(child) if name not in names]
+    return names
+
+def check_shapes(tree, shapes):
+    if tree.op == 'leaf':
+        if tree.name not in shapes:
+            raise ValueError(f"Matrix {tree.name} is not bound.")
+        tree.shape = shapes[tree.name]
+        return tree.shape
+    dims = [check_shapes(child, shapes) for child in tree.children]
+    if tree.op == 'T':
+        tree.shape = dims[0][::-1]
+    elif tree.op == 'neg':
+        tree.shape = dims[0]
+    elif tree.op == '@':
+        if dims[0][1] != dims[1][0]:
+            raise ValueError(f"Cannot multiply {dims[0][0]}x{dims[0][1]} by {dims[1][0]}x{dims[1][1]}.")
+        tree.shape = (dims[0][0], dims[1][1])
+    else:
+        if dims[0] != dims[1]:
+            raise ValueError(f"Cannot {'add' if tree.op == '+' else 'subtract'} "
+                             f"{dims[0][0]}x{dims[0][1]} and {dims[1][0]}x{dims[1][1]}.")
+        tree.shape = dims[0]
+    return tree.shape
+
+def naive_flops(tree):
+    # Cost of evaluating the tree exactly as written: left to right, one
+    # multiply-add per inner-product term and one op per element of a sum.
+    children = sum(naive_flops(child) for child in tree.children)
+    if tree.op == '@':
+        return children + 2 * tree.children[0].shape[0] * tree.children[0].shape[1] * tree.shape[1]
+    if tree.op in ('+', '-', 'neg'):
+        return children + tree.shape[0] * tree.shape[1]
+    return children
+
+def normalize(tree, transposed=False):
+    # Pushes transposes down to the operands using (AB)^T = B^T A^T and
+    # (A + B)^T = A^T + B^T, then flattens products into chains and sums
+    # into a single signed sum.
+    if tree.op == 'leaf':
+        node = Node('leaf', name=tree.name, transposed=transposed)
+        node.shape = tree.shape[::-1] if transposed else tree.shape
+        return node
+    if tree.op == 'T':
+        return normalize(tree.children[0], not transposed)
+    parts = [normalize(child, transposed) for child in tree.children]
+    if tree.op == '@':
+        operands = []
+        for part in reversed(parts) if transposed else parts:
+            operands += part.children if part.op == 'chain' else [part]
+        node = Node('chain', operands)
+        node.shape = (operands[0].shape[0], operands[-1].shape[1])
+        return node
+    terms, signs = [], []
+    for part, sign in zip(parts, (-1,) if tree.op == 'neg' else (1, 1 if tree.op == '+' else -1)):
+        if part.op == 'sum':
+            terms += part.children
+            signs += [sign * inner for inner in part.signs]
+        else:
+            terms.append(part)
+            signs.append(sign)
+    node = Node('sum', terms, signs=signs)
+    node.shape = terms[0].shape
+    return node
+
+def chain_order(dims):
+    # Classic matrix-chain dynamic program over dims p0..pn, O(n^3).
+    n = len(dims) - 1
+    cost = [[0] * n for _ in range(n)]
+    split = [[0] * n for _ in range(n)]
+    for length in range(1, n):
+        for i in range(n - length):
+            j = i + length
+            cost[i][j] = None
+            for k in range(i, j):
+                candidate = cost[i][k] + cost[k + 1][j] + dims[i] * dims[k + 1] * dims[j + 1]
+                if cost[i][j] is None or candidate < cost[i][j]:
+                    cost[i][j], split[i][j] = candidate, k
+    return cost[0][n - 1], split
+
+def plan_flops(node, counts):
+    # Plans children first so every node's key (its planned form) is known;
+    # repeated subexpressions are costed and later evaluated only once.
+    children = sum(plan_flops(child, counts) for child in node.children)
+    if node.op == 'leaf':
+        return 0
+    if node.op == 'chain':
+        dims = [operand.shape[0] for operand in node.children] + [node.shape[1]]
+        cost, node.split = chain_order(dims)
+        own = 2 * cost
+    else:
+        negations = 1 if node.signs[0] < 0 else 0
+        own = (len(node.children) - 1 + negations) * node.shape[0] * node.shape[1]
+    node.key = describe_plan(node)
+    counts[node.key] = counts.get(node.key, 0) + 1
+    return children + own if counts[node.key] == 1 else 0
+
+def describe_plan(node, i=0, j=None):
+    if node.op == 'leaf':
+        return node.name + ('.T' if node.transposed else '')
+    if node.op == 'sum':
+        text = ''
+        for sign, term in zip(node.signs, node.children):
+            if text:
+                text += ' - ' if sign < 0 else ' + '
+            elif sign < 0:
+                text = '-'
+            text += describe_plan(term)
+        return f"({text})"
+    j = len(node.children) - 1 if j is None else j
+    if i == j:
+        return describe_plan(node.children[i])
+    k = node.split[i][j]
+    return f"({describe_plan(node, i, k)} @ {describe_plan(node, k + 1, j)})"
+
+def evaluate_plan(node, matrices, dtype, out=None, shared=None):
+    if node.op == 'leaf':
+        value = matrices[node.name].T if node.transposed else matrices[node.name]
+    elif shared is not None and node.key in shared:
+        # Shared results get their own buffer so no caller can overwrite them.
+        if shared[node.key] is None:
+            shared[node.key] = evaluate_node(node, matrices, dtype, None, shared)
+        value = shared[node.key]
+    else:
+        return evaluate_node(node, matrices, dtype, out, shared)
+    if out is None:
+        return value
+    np.copyto(out, value)
+    return out
+
+def evaluate_node(node, matrices, dtype, out, shared):
+    if node.op == 'chain':
+        def product(i, j, target):
+            if i == j:
+                return evaluate_plan(node.children[i], matrices, dtype, target, shared)
+            k = node.split[i][j]
+            left, right = product(i, k, None), product(k + 1, j, None)
+            if target is None:
+                target = np.empty((left.shape[0], right.shape[1]), dtype=dtype)
+            return np.matmul(left, right, out=target)
+        return product(0, len(node.children) - 1, out)
+    # Every term accumulates into one output buffer; terms that are not
+    # plain operand views share a single scratch buffer.
+    out = np.empty(node.shape, dtype=dtype) if out is None else out
+    scratch = None
+    for index, (sign, term) in enumerate(zip(node.signs, node.children)):
+        if index == 0:
+            evaluate_plan(term, matrices, dtype, out, shared)
+            if sign < 0:
+                np.negative(out, out=out)
+            continue
+        if term.op != 'leaf' and term.key not in shared and scratch is None:
+            scratch = np.empty(node.shape, dtype=dtype)
+        target = None if term.op == 'leaf' or term.key in shared else scratch
+        value = evaluate_plan(term, matrices, dtype, target, shared)
+        (np.add if sign > 0 else np.subtract)(out, value, out=out)
+    return out
+
+def evaluate_expression(text, matrices):
+    # The planner relies on matmul/ufunc out= buffers, which sparse arrays
+    # do not support.
+    matrices = {name: m.toarray() if is_sparse(m) else m for name, m in matrices.items()}
+    tree = parse_expression(text)
+    check_shapes(tree, {name: np.shape(matrix) for name, matrix in matrices.items()})
+    plan = normalize(tree)
+    counts = {}
+    flops = plan_flops(plan, counts)
+    report = {'plan': describe_plan(plan), 'flops': flops, 'naive_flops': naive_flops(tree),
+              'shared': sorted(key for key, count in counts.items() if count > 1)}
+    shared = {key: None for key in report['shared']}
+    dtype = np.result_type(*[matrices[name].dtype for name in expression_names(tree)])
+    return evaluate_plan(plan, matrices, dtype, shared=shared), report
+
+def print_plan_report(report):
+    print(f"\nEvaluation plan: {report['plan']}")
+    saved = report['naive_flops'] - report['flops']
+    print(f"FLOPs: {report['flops']:,} (left-to-right: {report['naive_flops']:,}"
+          + (f", {report['naive_flops'] / report['flops']:.2f}x fewer)" if saved > 0 and report['flops'] else ")"))
+    for key in report['shared']:
+        print(f"Computed once and reused: {key}")
+
+def load_matrix(path, shape=None, dtype='float64'):
+    key = ''
+    if '.npz:' in path.lower():
+        path, _, key = path.rpartition(':')
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return np.load(path, mmap_mode='r')
+    if ext == '.npz':
+        with np.load(path) as data:
+            if not key and sp is not None and {'format', 'indptr'} <= set(data.files):
+                return sp.load_npz(path)
+            return data[key or data.files[0]]
+    if ext in RAW_EXTENSIONS:
+        if shape is None:
+            raise ValueError(f"Raw binary file '{path}' needs --shape ROWS,COLS.")
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+    return np.loadtxt(path, delimiter=',', dtype=dtype, ndmin=2)
+
+def matrix_file(path):
+    if '.npz:' in path.lower():
+        return path.rpartition(':')[0]
+    return path
+
+def check_output_path(out_path, operand_paths):
+    # Operands may be memory-mapped, so writing over one would truncate it
+    # while it is still being read.
+    if out_path and os.path.exists(out_path):
+        for path in map(matrix_file, operand_paths):
+            if os.path.exists(path) and os.path.samefile(out_path, path):
+                raise ValueError(f"Output '{out_path}' is also an operand; write the result to a different file.")
+
+def save_matrix(path, result):
+    ext = os.path.splitext(path)[1].lower()
+    if is_sparse(result):
+        if ext == '.npz':
+            sp.save_npz(path, result.tocsr())
+            return
+        result = result.toarray()
+    if ext == '.npy':
+        np.save(path, result)
+    elif ext == '.npz':
+        np.savez(path, result=result)
+    elif ext in RAW_EXTENSIONS:
+        np.asarray(result).tofile(path)
+    else:
+        np.savetxt(path, np.atleast_2d(result), delimiter=',')
 
 def matrix_addition():
     print("\n--- Matrix Addition (A + B) ---")
     matrix_a = get_matrix_input("Matrix A")
     matrix_b = get_matrix_input("Matrix B")
 
-    if matrix_a.shape != matrix_b.shape:
-        print("\nError: Matrices must have the same dimensions for addition.")
+    try:
+        result = add_matrices(matrix_a, matrix_b)
+    except ValueError as e:
+        print(f"\nError: {e}")
         return
 
-    result = matrix_a + matrix_b
     display_matrix(matrix_a, "Matrix A")
     display_matrix(matrix_b, "Matrix B")
     display_matrix(result, "Result (A + B)")
@@ -51,11 +689,12 @@ def matrix_subtraction():
     matrix_a = get_matrix_input("Matrix A")
     matrix_b = get_matrix_input("Matrix B")
 
-    if matrix_a.shape != matrix_b.shape:
-        print("\nError: Matrices must have the same dimensions for subtraction.")
+    try:
+        result = subtract_matrices(matrix_a, matrix_b)
+    except ValueError as e:
+        print(f"\nError: {e}")
         return
 
-    result = matrix_a - matrix_b
     display_matrix(matrix_a, "Matrix A")
     display_matrix(matrix_b, "Matrix B")
     display_matrix(result, "Result (A - B)")
@@ -65,11 +704,12 @@ def matrix_multiplication():
     matrix_a = get_matrix_input("Matrix A")
     matrix_b = get_matrix_input("Matrix B")
 
-    if matrix_a.shape[1] != matrix_b.shape[0]:
-        print("\nError: Number of columns in Matrix A must equal number of rows in Matrix B for multiplication.")
+    try:
+        result = multiply_matrices(matrix_a, matrix_b)
+    except ValueError as e:
+        print(f"\nError: {e}")
         return
 
-    result = np.dot(matrix_a, matrix_b)
     display_matrix(matrix_a, "Matrix A")
     display_matrix(matrix_b, "Matrix B")
     display_matrix(result, "Result (A x B)")
@@ -77,7 +717,7 @@ def matrix_multiplication():
 def matrix_transpose():
     print("\n--- Matrix Transpose ---")
     matrix = get_matrix_input("the matrix to transpose")
-    result = matrix.T
+    result = transpose_matrix(matrix)
     display_matrix(matrix, "Original Matrix")
     display_matrix(result, "Transposed Matrix")
 
@@ -88,17 +728,81 @@ def matrix_determinant():
     if matrix.shape[0] != matrix.shape[1]:
         print("\nError: Determinant can only be calculated for square matrices.")
         return
-    if matrix.shape[0] > 20: # Arbitrary limit to prevent very long computations for huge matrices
-        print("\nWarning: Calculating determinant for very large matrices can be computationally expensive.")
-        print("For matrices larger than 20x20, consider specialized libraries or methods if performance is critical.")
+    if matrix.shape[0] > LARGE_DETERMINANT:
+        print("\nWarning: Factorizing very large matrices is computationally expensive (O(n^3)).")
+        print("The factorization is cached, so further operations on this matrix are much cheaper.")
 
     try:
-        result = np.linalg.det(matrix)
+        sign, logdet = log_determinant(matrix)
         display_matrix(matrix, "Original Matrix")
-        print(f"\nDeterminant: {result:.4f}")
+        print(f"\nDeterminant: {format_determinant(sign, logdet)}")
+        print(f"Log |Determinant|: {logdet:.4f} (sign {sign:+.0f})")
     except np.linalg.LinAlgError:
         print("\nError: Cannot calculate determinant for this matrix (possibly singular).")
 
+def matrix_solve():
+    print("\n--- Solve Linear System (A x = B) ---")
+    matrix_a = get_matrix_input("Matrix A")
+    matrix_b = get_matrix_input("Matrix B (right-hand side)")
+
+    try:
+        result = solve_system(matrix_a, matrix_b)
+    except np.linalg.LinAlgError:
+        print("\nError: Matrix A is singular; the system has no unique solution.")
+        return
+    except ValueError as e:
+        print(f"\nError: {e}")
+        return
+
+    display_matrix(matrix_a, "Matrix A")
+    display_matrix(matrix_b, "Matrix B")
+    display_matrix(result, "Solution X")
+
+def matrix_inverse():
+    print("\n--- Matrix Inverse ---")
+    matrix = get_matrix_input("the square matrix to invert")
+
+    try:
+        result = inverse_matrix(matrix)
+    except np.linalg.LinAlgError:
+        print("\nError: Matrix is singular and cannot be inverted.")
+        return
+    except ValueError as e:
+        print(f"\nError: {e}")
+        return
+
+    display_matrix(matrix, "Original Matrix")
+    display_matrix(result, "Inverse Matrix")
+
+def matrix_rank():
+    print("\n--- Matrix Rank ---")
+    matrix = get_matrix_input("the matrix")
+    result = matrix_rank_of(matrix)
+    display_matrix(matrix, "Original Matrix")
+    print(f"\nRank: {result}")
+
+def matrix_expression():
+    print("\n--- Evaluate Matrix Expression ---")
+    print("Use matrix names with @ (multiply), + , - , .T (transpose) and parentheses, e.g. (A @ B @ C + D).T")
+    text = input("Expression: ")
+    try:
+        names = expression_names(parse_expression(text))
+    except ValueError as e:
+        print(f"\nError: {e}")
+        return
+    matrices = {name: get_matrix_input(f"Matrix {name}") for name in names}
+
+    try:
+        result, report = evaluate_expression(text, matrices)
+    except ValueError as e:
+        print(f"\nError: {e}")
+        return
+
+    for name, matrix in matrices.items():
+        display_matrix(matrix, f"Matrix {name}")
+    display_matrix(result, f"Result {text.strip()}")
+    print_plan_report(report)
+
 def main():
     print("Welcome to the Matrix Operations Tool!")
 
@@ -109,9 +813,13 @@ def main():
         print("3. Matrix Multiplication (A x B)")
         print("4. Matrix Transpose")
         print("5. Matrix Determinant")
-        print("6. Exit")
+        print("6. Solve Linear System (A x = B)")
+        print("7. Matrix Inverse")
+        print("8. Matrix Rank")
+        print("9. Evaluate Expression (e.g. (A @ B @ C + D).T)")
+        print("10. Exit")
 
-        choice = input("Enter your choice (1-6): ")
+        choice = input("Enter your choice (1-10): ")
 
         if choice == '1':
             matrix_addition()
@@ -124,11 +832,341 @@ def main():
         elif choice == '5':
             matrix_determinant()
         elif choice == '6':
+            matrix_solve()
+        elif choice == '7':
+            matrix_inverse()
+        elif choice == '8':
+            matrix_rank()
+        elif choice == '9':
+            matrix_expression()
+        elif choice == '10':
             print("Exiting Matrix Operations Tool. Goodbye!")
             break
         else:
-            print("Invalid choice. Please enter a number between 1 and 6.")
+            print("Invalid choice. Please enter a number between 1 and 10.")
         input("\nPress Enter to continue...") # Pause for user to see output
 
+OPERATIONS = {
+    'add': (add_matrices, 2, "Result (A + B)"),
+    'subtract': (subtract_matrices, 2, "Result (A - B)"),
+    'multiply': (multiply_matrices, 2, "Result (A x B)"),
+    'transpose': (transpose_matrix, 1, "Transposed Matrix"),
+    # Kept as (sign, log|det|) so large matrices do not overflow to +-inf or underflow to 0.
+    'determinant': (log_determinant, 1, "Determinant"),
+    'logdet': (log_determinant, 1, "Log-Determinant (sign, log|det|)"),
+    'solve': (solve_system, 2, "Solution X (A x = B)"),
+    'inverse': (inverse_matrix, 1, "Inverse Matrix"),
+    'rank': (matrix_rank_of, 1, "Rank"),
+}
+STREAMING_OPERATIONS = ('add', 'subtract', 'multiply', 'transpose')
+
+def parse_shape(text):
+    return tuple(int(part) for part in text.split(','))
+
+def run_batch(argv):
+    parser = argparse.ArgumentParser(description="Run a matrix operation on matrices stored in files.")
+    parser.add_argument('operation', choices=list(OPERATIONS))
+    parser.add_argument('operands', nargs='+',
+                        help=".npy (memory-mapped), .npz[:key], .csv/.txt or raw .bin/.raw/.dat files")
+    parser.add_argument('-o', '--output', help="write the result to .npy, .npz, .csv/.txt or raw binary")
+    parser.add_argument('--shape', type=parse_shape, help="ROWS,COLS of raw binary operands")
+    parser.add_argument('--dtype', default='float64', help="element type of raw binary and text operands")
+    parser.add_argument('--compute-dtype', type=np.dtype, default=COMPUTE_DTYPE,
+                        help="element type to compute in, e.g. float32 (default: $MATRIX_DTYPE or float64)")
+    parser.add_argument('--quiet', action='store_true', help="do not print operands or result")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="stream blocks straight into a memory-mapped .npy output (automatic for "
+                             "memory-mapped operands with a .npy output)")
+    parser.add_argument('--tile', type=int, help="tile size for out-of-core operations (default: from free memory)")
+    parser.add_argument('--workers', type=int, help="threads for out-of-core multiplication")
+    args = parser.parse_args(argv)
+
+    function, arity, title = OPERATIONS[args.operation]
+    if len(args.operands) != arity:
+        parser.error(f"{args.operation} takes {arity} operand(s), got {len(args.operands)}")
+    try:
+        check_output_path(args.output, args.operands)
+        matrices = [load_matrix(path, args.shape, args.dtype) for path in args.operands]
+        streaming = (args.operation in STREAMING_OPERATIONS and bool(args.output)
+                     and args.output.lower().endswith('.npy')
+                     and not any(is_sparse(m) for m in matrices)
+                     and (args.out_of_core or any(isinstance(m, np.memmap) for m in matrices)))
+        if args.out_of_core and not streaming:
+            print("Warning: out-of-core mode needs an add/subtract/multiply/transpose with a .npy output; "
+                  "computing in memory.")
+        if streaming:
+            result = function(*matrices, out_path=args.output, tile=args.tile, workers=args.workers,
+                              dtype=args.compute_dtype)
+        else:
+            matrices = [choose_format(m.astype(args.compute_dtype, copy=False)) for m in matrices]
+            result = function(*matrices)
+    except (OSError, ValueError, np.linalg.LinAlgError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not args.quiet:
+        for name, matrix in zip("AB", matrices):
+            display_matrix(matrix, f"Matrix {name}")
+    if args.operation == 'determinant':
+        print(f"\n{title}: {format_determinant(*result)}")
+    elif isinstance(result, tuple):
+        print(f"\n{title}: {result[0]:+.0f}, {result[1]:.4f}")
+    elif isinstance(result, int):
+        print(f"\n{title}: {result}")
+    elif not is_sparse(result) and np.ndim(result) == 0:
+        print(f"\n{title}: {result:.4f}")
+    elif not args.quiet:
+        display_matrix(result, title)
+    if args.output:
+        if not is_sparse(result):
+            # Rank (int) is saved as a plain array too; determinant and logdet are
+            # both saved as [sign, log|det|].
+            result = np.asarray(result)
+        if not streaming:
+            save_matrix(args.output, result)
+        shape = ' x '.join(map(str, np.shape(result))) or 'scalar'
+        print(f"Result ({shape} {result.dtype}) written to {args.output}")
+        if args.operation == 'determinant':
+            print("The determinant is saved as [sign, log|det|]; det = sign * exp(log|det|).")
+
+def parse_binding(text):
+    name, sep, path = text.partition('=')
+    if not sep or not name.isidentifier() or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=FILE, got {text!r}")
+    return name, path
+
+def run_expression(argv):
+    parser = argparse.ArgumentParser(prog=f"{os.path.basename(sys.argv[0])} eval",
+                                     description="Evaluate a matrix expression over matrices stored in files.")
+    parser.add_argument('expression', help="e.g. '(A @ B @ C + D).T' using @, +, -, .T and parentheses")
+    parser.add_argument('bindings', nargs='+', type=parse_binding, metavar='NAME=FILE',
+                        help=".npy (memory-mapped), .npz[:key], .csv/.txt or raw .bin/.raw/.dat files")
+    parser.add_argument('-o', '--output', help="write the result to .npy, .npz, .csv/.txt or raw binary")
+    parser.add_argument('--shape', type=parse_shape, help="ROWS,COLS of raw binary operands")
+    parser.add_argument('--dtype', default='float64', help="element type of raw binary and text operands")
+    parser.add_argument('--compute-dtype', type=np.dtype, default=COMPUTE_DTYPE,
+                        help="element type to compute in, e.g. float32 (default: $MATRIX_DTYPE or float64)")
+    parser.add_argument('--quiet', action='store_true', help="do not print operands or result")
+    args = parser.parse_args(argv)
+
+    try:
+        check_output_path(args.output, [path for _, path in args.bindings])
+        matrices = {name: load_matrix(path, args.shape, args.dtype).astype(args.compute_dtype, copy=False)
+                    for name, path in args.bindings}
+        result, report = evaluate_expression(args.expression, matrices)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not args.quiet:
+        for name, matrix in matrices.items():
+            display_matrix(matrix, f"Matrix {name}")
+        display_matrix(result, f"Result {args.expression}")
+    print_plan_report(report)
+    if args.output:
+        save_matrix(args.output, result)
+        print(f"Result ({' x '.join(map(str, np.shape(result)))} {result.dtype}) written to {args.output}")
+
+def parse_floats(text):
+    return [float(part) for part in text.split(',')]
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def storage_bytes(matrix):
+    if is_sparse(matrix):
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    return matrix.nbytes
+
+def run_sparse_bench(argv):
+    parser = argparse.ArgumentParser(prog=f"{os.path.basename(sys.argv[0])} sparse-bench",
+                                     description="Time dense and sparse paths across densities to tune SPARSE_DENSITY.")
+    parser.add_argument('--size', type=int, default=2000, help="square matrix size")
+    parser.add_argument('--densities', type=parse_floats,
+                        default=[0.0005, 0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if sp is None:
+        print("Error: the sparse benchmark needs SciPy.")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    # The identity keeps the matrices non-singular for the determinant.
+    identity = sp.eye_array(args.size, format='csr')
+    operations = {
+        'add': lambda a, b: a + b,
+        'multiply': lambda a, b: a @ b,
+        'transpose': lambda a, b: a.T.tocsr() if is_sparse(a) else np.ascontiguousarray(a.T),
+        # As dispatched: above SPARSE_LU_DENSITY this densifies and runs the dense LU.
+        'determinant': lambda a, b: log_determinant(a, FactorizationCache()),
+        # The sparse LU itself, whatever the density, to tune SPARSE_LU_DENSITY from.
+        'splu-logdet': lambda a, b: (splu_log_determinant(spla.splu(a.tocsc())) if is_sparse(a)
+                                     else log_determinant(a, FactorizationCache())),
+    }
+    crossover = dict.fromkeys(operations)
+    switched = False
+    print(f"{'density':>9} {'operation':>12} {'dense ms':>10} {'sparse ms':>10} {'speedup':>8} {'memory':>8}")
+    for fraction in args.densities:
+        sparse_a = (sp.random_array((args.size, args.size), density=fraction, format='csr', rng=rng) + identity).tocsr()
+        sparse_b = (sp.random_array((args.size, args.size), density=fraction, format='csr', rng=rng) + identity).tocsr()
+        dense_a, dense_b = sparse_a.toarray(), sparse_b.toarray()
+        memory = storage_bytes(sparse_a) / storage_bytes(dense_a)
+        for name, operation in operations.items():
+            dense = best_time(lambda: operation(dense_a, dense_b), args.repeat)
+            sparse = best_time(lambda: finish_result(operation(sparse_a, sparse_b)), args.repeat)
+            to_dense = name == 'determinant' and density(sparse_a) > SPARSE_LU_DENSITY
+            switched = switched or to_dense
+            print(f"{density(sparse_a):>9.4f} {name:>12} {dense * 1e3:>10.2f} {sparse * 1e3:>10.2f}"
+                  f"{'*' if to_dense else ' '}{dense / sparse:>7.2f}x {memory:>7.1%}")
+            if sparse < dense and not to_dense:
+                crossover[name] = density(sparse_a)
+    if switched:
+        print("\n* density above SPARSE_LU_DENSITY: the sparse input was densified and factored with the dense LU; "
+              "see splu-logdet for the sparse LU itself.")
+    print("\nHighest measured density at which the sparse path is faster:")
+    for name, value in crossover.items():
+        print(f"  {name:>12}: {'never' if value is None else f'{value:.4f}'}")
+    print(f"Current SPARSE_DENSITY = {SPARSE_DENSITY}, SPARSE_LU_DENSITY = {SPARSE_LU_DENSITY}")
+
+BENCH_OPERATIONS = {
+    # name: (core call, operand count, FLOPs for an n x n input)
+    'add': (add_matrices, 2, lambda n: n * n),
+    'subtract': (subtract_matrices, 2, lambda n: n * n),
+    'multiply': (multiply_matrices, 2, lambda n: 2 * n ** 3),
+    # transpose_matrix returns a view, so time materializing it.
+    'transpose': (lambda m: np.ascontiguousarray(transpose_matrix(m)), 1, lambda n: 0),
+    # A fresh cache per call times the factorization, not a cache hit.
+    'determinant': (lambda m: log_determinant(m, FactorizationCache()), 1, lambda n: 2 * n ** 3 // 3),
+}
+BENCH_LAYOUTS = ('contiguous', 'fortran', 'strided')
+
+def bench_operand(base, dtype, layout):
+    if layout == 'fortran':
+        return np.asfortranarray(base, dtype=dtype)
+    if layout == 'strided':
+        # Every other column of a twice-as-wide buffer.
+        wide = np.empty((base.shape[0], 2 * base.shape[1]), dtype=dtype)
+        wide[:, ::2] = base
+        return wide[:, ::2]
+    return base.astype(dtype, copy=False)
+
+def relative_error(result, reference):
+    if isinstance(reference, tuple):
+        if result[0] != reference[0]:
+            return float('inf')
+        return 0.0 if reference[0] == 0 else abs(float(np.expm1(result[1] - reference[1])))
+    worst = scale = 0.0
+    block = max(1, 2 ** 22 // max(1, reference.shape[1]))
+    for i in range(0, reference.shape[0], block):
+        expected = np.asarray(reference[i:i + block], dtype=np.float64)
+        worst = max(worst, float(np.max(np.abs(np.asarray(result[i:i + block], dtype=np.float64) - expected))))
+        scale = max(scale, float(np.max(np.abs(expected))))
+    return worst / scale if scale else worst
+
+def peak_memory(function, operands):
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        function(*operands)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+def run_benchmark(argv):
+    parser = argparse.ArgumentParser(prog=f"{os.path.basename(sys.argv[0])} bench",
+                                     description="Time the core operations across sizes, dtypes and layouts.")
+    parser.add_argument('--sizes', type=parse_shape, default=(10, 100, 1000, 10000))
+    parser.add_argument('--dtypes', type=lambda text: [np.dtype(part) for part in text.split(',')],
+                        default=[np.dtype('float32'), np.dtype('float64')])
+    parser.add_argument('--layouts', type=lambda text: text.split(','), default=['contiguous', 'strided'],
+                        help=f"comma-separated from {', '.join(BENCH_LAYOUTS)}")
+    parser.add_argument('--operations', type=lambda text: text.split(','), default=list(BENCH_OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case (one for n > 1000)")
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help="largest relative error that still counts float32 as good enough")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write one JSON record per case to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.layouts) - set(BENCH_LAYOUTS) | set(args.operations) - set(BENCH_OPERATIONS)
+    if unknown:
+        parser.error(f"unknown layouts/operations: {', '.join(sorted(unknown))}")
+
+    rng = np.random.default_rng(args.seed)
+    records = []
+    budget = available_memory() * 0.8
+    print(f"{'operation':>11} {'n':>6} {'dtype':>8} {'layout':>10} {'ms':>10} {'GFLOP/s':>8} {'GB/s':>7} "
+          f"{'peak MB':>8} {'rel error':>10}")
+    for n in args.sizes:
+        bases = [rng.standard_normal((n, n)) for _ in range(2)]
+        for name in args.operations:
+            function, arity, flops = BENCH_OPERATIONS[name]
+            # Both float64 bases plus the reference result stay resident.
+            resident = 3 * n * n * 8
+            if resident > budget:
+                print(f"{name:>11} {n:>6}  skipped: float64 reference does not fit in memory")
+                continue
+            reference = None
+            for dtype, layout in product(args.dtypes, args.layouts):
+                copies = 0 if (dtype, layout) == (np.float64, 'contiguous') else 2 if layout == 'strided' else 1
+                if resident + (arity * copies + 1) * n * n * dtype.itemsize > budget:
+                    print(f"{name:>11} {n:>6} {dtype.name:>8} {layout:>10}  skipped: does not fit in memory")
+                    continue
+                if reference is None:
+                    reference = function(*bases[:arity])
+                operands = [bench_operand(base, dtype, layout) for base in bases[:arity]]
+                result = function(*operands)
+                seconds = best_time(functools.partial(function, *operands), args.repeat if n <= 1000 else 1)
+                moved = (arity + (name != 'determinant')) * n * n * dtype.itemsize
+                record = {
+                    'operation': name, 'n': n, 'dtype': dtype.name, 'layout': layout,
+                    'seconds': seconds, 'gflops': flops(n) / seconds / 1e9, 'gbps': moved / seconds / 1e9,
+                    'peak_mb': peak_memory(function, operands) / 2 ** 20,
+                    'error': relative_error(result, reference),
+                }
+                records.append(record)
+                rate = f"{record['gflops']:>8.2f}" if flops(n) else f"{'-':>8}"
+                print(f"{name:>11} {n:>6} {dtype.name:>8} {layout:>10} {seconds * 1e3:>10.3f} "
+                      f"{rate} {record['gbps']:>7.2f} {record['peak_mb']:>8.1f} "
+                      f"{record['error']:>10.2e}")
+                del operands, result
+            del reference
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    print(f"\nfloat32 vs float64 (contiguous), tolerance {args.tolerance:g}:")
+    suitable = []
+    for name in args.operations:
+        pairs = [(single, double) for single in records for double in records
+                 if single['operation'] == double['operation'] == name and single['n'] == double['n']
+                 and single['layout'] == double['layout'] == 'contiguous'
+                 and (single['dtype'], double['dtype']) == ('float32', 'float64')]
+        if not pairs:
+            continue
+        speedup = np.median([double['seconds'] / single['seconds'] for single, double in pairs])
+        error = max(single['error'] for single, _ in pairs)
+        ok = error <= args.tolerance
+        suitable.append(ok)
+        print(f"  {name:>11}: {speedup:.2f}x faster, worst error {error:.2e} -> {'float32 ok' if ok else 'keep float64'}")
+    if suitable:
+        print(f"Suggested --compute-dtype: {'float32' if all(suitable) else 'float64'}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'eval':
+        run_expression(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'sparse-bench':
+        run_sparse_bench(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        run_benchmark(sys.argv[2:])
+    elif len(sys.argv) > 1:
+        run_batch(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file
@@ -1,29 +1,421 @@
-import speech_recognition as sr
-import pyttsx3
+import argparse
 import datetime
+import os
+import random
+import re
 import requests
+import tempfile
 import json
 import webbrowser
 import time
 import threading
+from queue import PriorityQueue, Empty
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 NEWS_API_KEY = 'API_KEY'
 WEATHER_API_KEY = 'WEATHER_API_KEY'
 WEATHER_CITY = 'Mangalpalle'
+# Overridable so the assistant can be pointed at a local stub server.
+WEATHER_URL = os.environ.get('WEATHER_URL', "http://api.openweathermap.org/data/2.5/weather")
+NEWS_URL = os.environ.get('NEWS_URL', "https://newsapi.org/v2/top-headlines")
+REQUEST_TIMEOUT = (3.05, 10)
+WEATHER_TTL = 600
+NEWS_TTL = 300
+# How long an expired entry may still be served while a refresh runs.
+STALE_TTL = 3600
+PRIORITY_REMINDER = 0
+PRIORITY_NORMAL = 1
+REMINDER_LOG = os.environ.get('REMINDER_LOG', os.path.expanduser('~/.assistant_reminders.jsonl'))
+# Reminders falling due within this many seconds of each other are spoken together.
+COALESCE_WINDOW = 1.0
+COMPACT_MIN_RECORDS = 1000
 
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-try:
-    engine.setProperty('voice', voices[1].id)
-except IndexError:
-    pass
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                      max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504)))
+session.mount("http://", adapter)
+session.mount("https://", adapter)
 
-def speak(audio):
+class TTLCache:
+    def __init__(self, ttl, stale_ttl=STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.entries = {}
+        self.refreshing = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def get(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if entry and age < self.ttl:
+                self.hits += 1
+                return entry[0]
+            if entry and age < self.ttl + self.stale_ttl:
+                # Stale-while-revalidate: answer now, refresh in the background.
+                self.stale_hits += 1
+                self._refresh(key, loader)
+                return entry[0]
+            pending = self.refreshing.get(key)
+        if pending and pending.wait(sum(REQUEST_TIMEOUT)):
+            # A prefetch for this key was already in flight.
+            with self.lock:
+                if key in self.entries:
+                    self.hits += 1
+                    return self.entries[key][0]
+        with self.lock:
+            self.misses += 1
+        return self._load(key, loader)
+
+    def prefetch(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry or time.monotonic() - entry[1] >= self.ttl:
+                self._refresh(key, loader)
+
+    def _refresh(self, key, loader):
+        if key not in self.refreshing:
+            self.refreshing[key] = threading.Event()
+            threading.Thread(target=self._background_load, args=(key, loader), daemon=True).start()
+
+    def _background_load(self, key, loader):
+        try:
+            self._load(key, loader)
+        except Exception:
+            with self.lock:
+                self.refresh_errors += 1
+        finally:
+            with self.lock:
+                self.refreshing.pop(key).set()
+
+    def _load(self, key, loader):
+        value = loader()
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses,
+                    'refresh_errors': self.refresh_errors, 'entries': len(self.entries)}
+
+weather_cache = TTLCache(WEATHER_TTL)
+news_cache = TTLCache(NEWS_TTL)
+
+class ServiceError(Exception):
+    # Raised for error payloads so the caches, which only store what a loader
+    # returns, never keep them.
+    def __init__(self, message, payload):
+        super().__init__(message)
+        self.payload = payload
+
+def fetch_weather(city):
+    params = {'q': city, 'appid': WEATHER_API_KEY, 'units': 'metric'}
+    res = session.get(WEATHER_URL, params=params, timeout=REQUEST_TIMEOUT)
+    data = res.json()
+    if not res.ok or str(data.get('cod')) != '200':
+        raise ServiceError(data.get('message') or f"HTTP {res.status_code}", data)
+    return data
+
+def fetch_news():
+    params = {'country': 'in', 'apiKey': NEWS_API_KEY}
+    res = session.get(NEWS_URL, params=params, timeout=REQUEST_TIMEOUT)
+    data = res.json()
+    if not res.ok or data.get('status') != 'ok':
+        raise ServiceError(data.get('message') or f"HTTP {res.status_code}", data)
+    return data
+
+def prefetch():
+    weather_cache.prefetch(WEATHER_CITY.lower(), lambda: fetch_weather(WEATHER_CITY))
+    news_cache.prefetch('in', fetch_news)
+
+def init_engine():
+    # Imported here so the speech stack loads on the worker thread, not at startup.
+    import pyttsx3
+    engine = pyttsx3.init()
+    voices = engine.getProperty('voices')
+    try:
+        engine.setProperty('voice', voices[1].id)
+    except IndexError:
+        pass
+    return engine
+
+class SpeechWorker(threading.Thread):
+    # Owns the pyttsx3 engine and pumps it with an external loop, so callers
+    # (including reminder timers on other threads) only enqueue text.
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.queue = PriorityQueue()
+        self.sequence = 0
+        self.generation = 0
+        self.cancel_requested = False
+        self.speaking = False
+        self.current = None
+        self.lock = threading.Lock()
+        self.command_time = None
+        self.latencies = []
+
+    def say(self, text, priority=PRIORITY_NORMAL):
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+            self.sequence += 1
+            self.queue.put((priority, self.sequence, self.generation, text))
+
+    def interrupt(self):
+        # Barge-in: a new command drops queued normal output and cuts off the
+        # current utterance. Reminders are never dropped.
+        with self.lock:
+            self.generation += 1
+            # A reminder already playing is left to finish: the scheduler has
+            # logged it as done, so cutting it off would lose it.
+            self.cancel_requested = (self.speaking and self.current is not None
+                                     and self.current[0] != PRIORITY_REMINDER)
+            self.command_time = time.perf_counter()
+
+    def wait_until_done(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (self.speaking or not self.queue.empty()) and self.is_alive():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def run(self):
+        engine = init_engine()
+        engine.connect('started-utterance', self.on_started)
+        engine.startLoop(False)
+        while True:
+            if self.cancel_requested:
+                self.cancel_requested = False
+                engine.stop()
+            if not engine.isBusy():
+                self.speaking = False
+                try:
+                    priority, _, generation, text = self.queue.get(timeout=0.05)
+                except Empty:
+                    continue
+                if priority != PRIORITY_REMINDER and generation < self.generation:
+                    continue
+                self.speaking = True
+                self.current = (priority, generation)
+                engine.say(text)
+            engine.iterate()
+            time.sleep(0.01)
+
+    def on_started(self, name=None):
+        with self.lock:
+            if self.command_time is not None and self.current == (PRIORITY_NORMAL, self.generation):
+                self.latencies.append(time.perf_counter() - self.command_time)
+                self.command_time = None
+
+    def latency_summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return {'count': len(latencies),
+                'p50_ms': latencies[len(latencies) // 2] * 1000,
+                'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                'max_ms': latencies[-1] * 1000}
+
+speech = SpeechWorker()
+
+class ReminderScheduler(threading.Thread):
+    # One thread over an indexed min-heap of (due, sequence, id): insert and
+    # cancel are O(log n). Every change is appended to a JSON-lines log that
+    # is replayed on start and compacted once it is mostly dead records.
+    def __init__(self, log_path, callback):
+        super().__init__(daemon=True)
+        self.log_path = log_path
+        self.callback = callback
+        self.heap = []
+        self.position = {}
+        self.reminders = {}
+        self.next_id = 1
+        self.sequence = 0
+        self.log = None
+        self.log_records = 0
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.fired = 0
+
+    def ensure_started(self):
+        with self.condition:
+            if self.log is None:
+                self.replay()
+                self.log = open(self.log_path, 'a')
+                self.start()
+
+    def replay(self):
+        records = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write.
+                        continue
+        for record in records:
+            if record['op'] == 'add':
+                self.reminders[record['id']] = [record['task'], record['due'], record['every']]
+                self.next_id = max(self.next_id, record['id'] + 1)
+            elif record['op'] == 'due' and record['id'] in self.reminders:
+                self.reminders[record['id']][1] = record['due']
+            elif record['op'] in ('cancel', 'done'):
+                self.reminders.pop(record['id'], None)
+        for reminder_id, (task, due, every) in self.reminders.items():
+            self.push(due, reminder_id)
+        self.log_records = len(records)
+
+    def write(self, record):
+        self.log.write(json.dumps(record) + '\n')
+        self.log.flush()
+        self.log_records += 1
+        if self.log_records > COMPACT_MIN_RECORDS and self.log_records > 2 * len(self.reminders):
+            self.compact()
+
+    def compact(self):
+        temp_path = self.log_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for reminder_id, (task, due, every) in self.reminders.items():
+                f.write(json.dumps({'op': 'add', 'id': reminder_id, 'task': task, 'due': due, 'every': every}) + '\n')
+        self.log.close()
+        os.replace(temp_path, self.log_path)
+        self.log = open(self.log_path, 'a')
+        self.log_records = len(self.reminders)
+
+    def add(self, task, due, every=None):
+        self.ensure_started()
+        with self.condition:
+            reminder_id = self.next_id
+            self.next_id += 1
+            self.reminders[reminder_id] = [task, due, every]
+            self.write({'op': 'add', 'id': reminder_id, 'task': task, 'due': due, 'every': every})
+            self.push(due, reminder_id)
+            self.condition.notify()
+        return reminder_id
+
+    def cancel(self, reminder_id):
+        self.ensure_started()
+        with self.condition:
+            if reminder_id not in self.reminders:
+                return False
+            del self.reminders[reminder_id]
+            self.remove(self.position[reminder_id])
+            self.write({'op': 'cancel', 'id': reminder_id})
+            self.condition.notify()
+        return True
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.join()
+        self.log.close()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.stopped and (not self.heap or self.heap[0][0] > time.time()):
+                    self.condition.wait(self.heap[0][0] - time.time() if self.heap else None)
+                if self.stopped:
+                    return
+                tasks = self.pop_due()
+            try:
+                self.callback(tasks)
+            except Exception as e:
+                print(f"Reminder callback failed: {e}")
+
+    def pop_due(self):
+        now = time.time()
+        tasks = {}
+        recurring = []
+        while self.heap and self.heap[0][0] <= now + COALESCE_WINDOW:
+            reminder_id = self.heap[0][2]
+            self.remove(0)
+            task, due, every = self.reminders[reminder_id]
+            tasks[task] = None
+            if every:
+                # Skip occurrences missed while the assistant was not running.
+                due += every * max(1, int((now - due) // every) + 1)
+                self.reminders[reminder_id][1] = due
+                self.write({'op': 'due', 'id': reminder_id, 'due': due})
+                recurring.append((due, reminder_id))
+            else:
+                del self.reminders[reminder_id]
+                self.write({'op': 'done', 'id': reminder_id})
+        # Pushed back only now so a short period cannot fire twice in one batch.
+        for due, reminder_id in recurring:
+            self.push(due, reminder_id)
+        self.fired += len(tasks)
+        return list(tasks)
+
+    def push(self, due, reminder_id):
+        self.sequence += 1
+        self.heap.append((due, self.sequence, reminder_id))
+        self.position[reminder_id] = len(self.heap) - 1
+        self.sift_up(len(self.heap) - 1)
+
+    def remove(self, index):
+        removed = self.heap[index]
+        last = self.heap.pop()
+        del self.position[removed[2]]
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.position[last[2]] = index
+            self.sift_down(index)
+            self.sift_up(self.position[last[2]])
+
+    def swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][2]] = i
+        self.position[self.heap[j][2]] = j
+
+    def sift_up(self, index):
+        while index > 0:
+            parent = (index - 1) // 2
+            if self.heap[parent] <= self.heap[index]:
+                break
+            self.swap(parent, index)
+            index = parent
+
+    def sift_down(self, index):
+        size = len(self.heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and self.heap[child] < self.heap[smallest]:
+                    smallest = child
+            if smallest == index:
+                return
+            self.swap(index, smallest)
+            index = smallest
+
+def fire_reminders(tasks):
+    speak(f"Reminder: It's time to {' and '.join(tasks)}!", PRIORITY_REMINDER)
+
+reminders = ReminderScheduler(REMINDER_LOG, fire_reminders)
+
+def speak(audio, priority=PRIORITY_NORMAL, wait=False):
     print(f"Assistant: {audio}")
-    engine.say(audio)
-    engine.runAndWait()
+    speech.say(audio, priority)
+    if wait:
+        speech.wait_until_done()
+
+def ask(question):
+    # Questions finish playing before the microphone opens for the answer.
+    speak(question, wait=True)
+    return listen_command()
 
 def listen_command():
+    import speech_recognition as sr
     r = sr.Recognizer()
     with sr.Microphone() as source:
         print("Listening...")
@@ -44,6 +436,7 @@ def listen_command():
         return ""
 
 def greet_user():
+    prefetch()
     hour = int(datetime.datetime.now().hour)
     if 0 <= hour < 12:
         speak("Good Morning!")
@@ -54,46 +447,44 @@ def greet_user():
     speak("I am your personal assistant. How can I help you today?")
 
 def get_weather(city):
-    base_url = "http://api.openweathermap.org/data/2.5/weather?"
-    complete_url = f"{base_url}q={city}&appid={WEATHER_API_KEY}&units=metric"
     try:
-        response = requests.get(complete_url)
-        data = response.json()
-
-        if data["cod"] != "404":
-            main = data["main"]
-            weather_description = data["weather"][0]["description"]
-            temperature = main["temp"]
-            humidity = main["humidity"]
-            speak(f"The weather in {city} is {weather_description}.")
-            speak(f"The temperature is {temperature:.1f} degrees Celsius with {humidity} percent humidity.")
-        else:
+        data = weather_cache.get(city.lower(), lambda: fetch_weather(city))
+
+        main = data["main"]
+        weather_description = data["weather"][0]["description"]
+        temperature = main["temp"]
+        humidity = main["humidity"]
+        speak(f"The weather in {city} is {weather_description}.")
+        speak(f"The temperature is {temperature:.1f} degrees Celsius with {humidity} percent humidity.")
+    except ServiceError as e:
+        if str(e.payload.get('cod')) == '404':
             speak(f"Sorry, I couldn't find weather information for {city}.")
-    except requests.exceptions.ConnectionError:
+        else:
+            speak(f"The weather service returned an error: {e}")
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         speak("I'm having trouble connecting to the weather service. Please check your internet connection.")
     except Exception as e:
         speak(f"An error occurred while fetching weather data: {e}")
 
 def get_news():
-    url = f"https://newsapi.org/v2/top-headlines?country=in&apiKey={NEWS_API_KEY}"
     try:
-        response = requests.get(url)
-        news_data = response.json()
-        if news_data['status'] == 'ok' and news_data['articles']:
+        news_data = news_cache.get('in', fetch_news)
+        if news_data['articles']:
             speak("Here are the top headlines:")
             for i, article in enumerate(news_data['articles'][:5]):
                 title = article['title']
                 speak(f"News number {i+1}: {title}.")
-                time.sleep(1)
             speak("You can find more news on your browser.")
         else:
             speak("Sorry, I couldn't fetch the news at the moment.")
-    except requests.exceptions.ConnectionError:
+    except ServiceError:
+        speak("Sorry, I couldn't fetch the news at the moment.")
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         speak("I'm having trouble connecting to the news service. Please check your internet connection.")
     except Exception as e:
         speak(f"An error occurred while fetching news: {e}")
 
-def set_reminder(remind_time_str, task):
+def set_reminder(remind_time_str, task, every=None):
     try:
         remind_hour, remind_minute = map(int, remind_time_str.split(':'))
         
@@ -106,8 +497,9 @@ def set_reminder(remind_time_str, task):
         time_difference = (remind_time - now).total_seconds()
 
         if time_difference > 0:
-            speak(f"Okay, I will remind you to {task} at {remind_time.strftime('%I:%M %p')}.")
-            threading.Timer(time_difference, lambda: speak(f"Reminder: It's time to {task}!")).start()
+            repeat = " every day" if every == 86400 else ""
+            speak(f"Okay, I will remind you to {task} at {remind_time.strftime('%I:%M %p')}{repeat}.")
+            reminders.add(task, remind_time.timestamp(), every)
         else:
             speak("I cannot set a reminder for a time that has already passed today. Please specify a future time.")
     except ValueError:
@@ -116,56 +508,240 @@ def set_reminder(remind_time_str, task):
         speak(f"An error occurred while setting the reminder: {e}")
 
 
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+def tokenize(text):
+    return WORD_PATTERN.findall(text.lower())
+
+class IntentRegistry:
+    # Intents are keyed by whole-word phrases compiled into a token trie, so
+    # "hi" never matches inside "this". Matching walks the trie from each word
+    # of the transcript, bounded by the longest phrase rather than by the
+    # number of intents. Lower priority numbers win; ties go to the longer
+    # phrase, then the earlier one.
+    def __init__(self):
+        self.entries = []
+        self.trie = None
+
+    def register(self, *phrases, priority=50):
+        def decorator(handler):
+            self.add(handler, phrases, priority)
+            return handler
+        return decorator
+
+    def add(self, handler, phrases, priority):
+        self.entries.append((handler, [tuple(tokenize(phrase)) for phrase in phrases], priority))
+        self.trie = None
+
+    def compile(self):
+        trie = {}
+        for handler, phrases, priority in self.entries:
+            for words in phrases:
+                node = trie
+                for word in words:
+                    node = node.setdefault(word, {})
+                node.setdefault(None, []).append((priority, -len(words), handler))
+        self.trie = trie
+
+    def match(self, command):
+        if self.trie is None:
+            self.compile()
+        words = tokenize(command)
+        best = None
+        for start in range(len(words)):
+            node = self.trie
+            for word in words[start:]:
+                node = node.get(word)
+                if node is None:
+                    break
+                for priority, length, handler in node.get(None, ()):
+                    if best is None or (priority, length, start) < best[:3]:
+                        best = (priority, length, start, handler)
+        return best[3] if best else None
+
+    def match_linear(self, command):
+        # Reference matcher that tries every phrase; used by the benchmark.
+        words = tokenize(command)
+        best = None
+        for handler, phrases, priority in self.entries:
+            for phrase in phrases:
+                for start in range(len(words) - len(phrase) + 1):
+                    if tuple(words[start:start + len(phrase)]) == phrase:
+                        if best is None or (priority, -len(phrase), start) < best[:3]:
+                            best = (priority, -len(phrase), start, handler)
+                        break
+        return best[3] if best else None
+
+intents = IntentRegistry()
+
+@intents.register("set a reminder", "remind me", priority=10)
+def handle_reminder(command):
+    task = ask("What should I remind you about?")
+    if task:
+        time_str = ask("And for what time? Please say it like '3:30 PM'.")
+        if "am" in time_str:
+            time_str = time_str.replace("am", "").strip()
+        elif "pm" in time_str:
+            parts = time_str.replace("pm", "").strip().split(':')
+            hour = int(parts[0])
+            if hour != 12:
+                hour += 12
+            time_str = f"{hour}:{parts[1]}"
+
+        every = 86400 if "every day" in command or "daily" in command else None
+        set_reminder(time_str, task, every)
+    else:
+        speak("I didn't get the task for the reminder.")
+
+@intents.register("exit", "quit", "bye", "goodbye", priority=20)
+def handle_exit(command):
+    speak("Goodbye! Have a great day.", wait=True)
+    latency = speech.latency_summary()
+    if latency:
+        print(f"Command-to-first-audio latency over {latency['count']} commands: "
+              f"p50 {latency['p50_ms']:.0f} ms, p95 {latency['p95_ms']:.0f} ms, max {latency['max_ms']:.0f} ms")
+    return False
+
+@intents.register("open google", priority=30)
+def handle_open_google(command):
+    speak("Opening Google.")
+    webbrowser.open("https://www.google.com")
+
+@intents.register("open youtube", priority=30)
+def handle_open_youtube(command):
+    speak("Opening YouTube.")
+    webbrowser.open("https://www.youtube.com")
+
+@intents.register("weather", priority=40)
+def handle_weather(command):
+    speak(f"Checking weather for {WEATHER_CITY}.")
+    get_weather(WEATHER_CITY)
+
+@intents.register("news", "headlines", priority=40)
+def handle_news(command):
+    get_news()
+
+@intents.register("time", priority=50)
+def handle_time(command):
+    str_time = datetime.datetime.now().strftime("%I:%M %p")
+    speak(f"The current time is {str_time}")
+
+@intents.register("date", "what day", priority=50)
+def handle_date(command):
+    str_date = datetime.datetime.now().strftime("%A, %B %d, %Y")
+    speak(f"Today is {str_date}")
+
+@intents.register("hello", "hi", "hey", priority=90)
+def handle_hello(command):
+    speak("Hello there! How can I assist you?")
+
 def run_assistant():
+    reminders.ensure_started()
     greet_user()
     while True:
         command = listen_command()
-
-        if "hello" in command or "hi" in command:
-            speak("Hello there! How can I assist you?")
-        elif "time" in command:
-            str_time = datetime.datetime.now().strftime("%I:%M %p")
-            speak(f"The current time is {str_time}")
-        elif "date" in command:
-            str_date = datetime.datetime.now().strftime("%A, %B %d, %Y")
-            speak(f"Today is {str_date}")
-        elif "weather" in command:
-            speak(f"Checking weather for {WEATHER_CITY}.")
-            get_weather(WEATHER_CITY)
-        elif "news" in command:
-            get_news()
-        elif "set a reminder" in command:
-            speak("What should I remind you about?")
-            task = listen_command()
-            if task:
-                speak("And for what time? Please say it like '3:30 PM'.")
-                time_str = listen_command()
-                if "am" in time_str:
-                    time_str = time_str.replace("am", "").strip()
-                elif "pm" in time_str:
-                    parts = time_str.replace("pm", "").strip().split(':')
-                    hour = int(parts[0])
-                    if hour != 12:
-                        hour += 12
-                    time_str = f"{hour}:{parts[1]}"
-                
-                set_reminder(time_str, task)
-            else:
-                speak("I didn't get the task for the reminder.")
-
-        elif "open google" in command:
-            speak("Opening Google.")
-            webbrowser.open("https://www.google.com")
-        elif "open youtube" in command:
-            speak("Opening YouTube.")
-            webbrowser.open("https://www.youtube.com")
-        elif "exit" in command or "quit" in command or "bye" in command:
-            speak("Goodbye! Have a great day.")
-            break
-        elif not command:
+        if not command:
             speak("Could you please repeat that? I didn't catch it.")
-        else:
+            continue
+        speech.interrupt()
+
+        handler = intents.match(command)
+        if handler is None:
             speak("I'm sorry, I don't know how to do that yet. Can I help with something else?")
+        elif handler(command) is False:
+            break
+
+SAMPLE_TRANSCRIPTS = [
+    "hi there", "what time is it", "what is the date today", "what's the weather like",
+    "read me the news", "set a reminder for this evening", "please set a reminder at the usual time",
+    "open google", "open youtube please", "this is not a command", "remind me daily to drink water",
+    "okay bye", "tell me a joke", "what day is it tomorrow", "give me the headlines",
+]
+
+def bench_intents(path, extra_intents):
+    if path:
+        with open(path) as f:
+            transcripts = [line.strip().lower() for line in f if line.strip()]
+    else:
+        transcripts = SAMPLE_TRANSCRIPTS * 200
+    print(f"{len(transcripts)} transcripts, {sum(len(tokenize(t)) for t in transcripts) / len(transcripts):.1f} words each")
+    print(f"{'intents':>8} {'phrases':>8} {'trie/s':>12} {'linear/s':>12}")
+    for extra in sorted({0, *extra_intents}):
+        registry = IntentRegistry()
+        for handler, phrases, priority in intents.entries:
+            registry.entries.append((handler, phrases, priority))
+        for i in range(extra):
+            registry.add(None, [f"custom command {i}", f"do thing {i} now"], 60)
+        registry.compile()
+        rates = []
+        for match in (registry.match, registry.match_linear):
+            start = time.perf_counter()
+            results = [match(transcript) for transcript in transcripts]
+            rates.append(len(transcripts) / (time.perf_counter() - start))
+        assert results == [registry.match(transcript) for transcript in transcripts]
+        print(f"{len(registry.entries):>8} {sum(len(p) for _, p, _ in registry.entries):>8} "
+              f"{rates[0]:>12,.0f} {rates[1]:>12,.0f}")
+
+def stress_reminders(count, log_path):
+    log_path = log_path or os.path.join(tempfile.mkdtemp(), 'reminders.jsonl')
+    fired = []
+    scheduler = ReminderScheduler(log_path, fired.extend)
+    threads_before = threading.active_count()
+    scheduler.ensure_started()
+    # Hold the scheduler's (reentrant) lock through the add and cancel phases
+    # so nothing fires before it is counted, however long adding N takes.
+    with scheduler.condition:
+        start = time.time()
+        ids = [scheduler.add(f"task {i}", start + 2 + random.random() * 3, 1.0 if i % 10 == 0 else None)
+               for i in range(count)]
+        added = time.time() - start
+        cancel_start = time.time()
+        cancelled = sum(scheduler.cancel(reminder_id) for reminder_id in random.sample(ids, count // 10))
+        cancel_time = time.time() - cancel_start
+        one_shots = sum(1 for task, due, every in scheduler.reminders.values() if not every)
+    threads = threading.active_count() - threads_before
+    if one_shots == 0:
+        scheduler.stop()
+        raise SystemExit(f"--stress-reminders {count}: no one-shot reminders left to fire, nothing to measure")
+
+    deadline = time.time() + 30
+    while time.time() < deadline and any(not every for task, due, every in list(scheduler.reminders.values())):
+        time.sleep(0.1)
+    live = len(scheduler.reminders)
+    scheduler.stop()
+
+    replay_start = time.time()
+    replayed = ReminderScheduler(log_path, fired.extend)
+    replayed.replay()
+    replay = time.time() - replay_start
+
+    try:
+        import resource
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        peak_rss = 0
+    print(f"added {count} reminders in {added:.2f}s ({count / added:,.0f}/s), "
+          f"cancelled {cancelled}/{count // 10} in {cancel_time:.2f}s")
+    print(f"scheduler threads: {threads}, peak RSS: {peak_rss:.0f} MB")
+    print(f"one-shot reminders fired: {one_shots - sum(1 for r in scheduler.reminders.values() if not r[2])}/{one_shots}, "
+          f"callbacks: {scheduler.fired} tasks")
+    print(f"replayed {len(replayed.reminders)}/{live} live reminders from {replayed.log_records} log records "
+          f"in {replay:.2f}s ({os.path.getsize(log_path) / 2 ** 20:.1f} MB log)")
 
 if __name__ == "__main__":
-    run_assistant()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Voice assistant.")
+    parser.add_argument('--stress-reminders', type=int, metavar='N',
+                        help="schedule N reminders against a scratch log and report throughput")
+    parser.add_argument('--reminder-log', help="log file for --stress-reminders (default: a temporary file)")
+    parser.add_argument('--bench-intents', nargs='?', const='', metavar='FILE',
+                        help="measure intent matching throughput over transcripts in FILE (one per line; "
+                             "built-in samples if omitted)")
+    parser.add_argument('--extra-intents', type=lambda text: [int(n) for n in text.split(',')],
+                        default=[100, 1000], help="synthetic intents to add for --bench-intents scaling runs")
+    args = parser.parse_args()
+    if args.stress_reminders:
+        stress_reminders(args.stress_reminders, args.reminder_log)
+    elif args.bench_intents is not None:
+        bench_intents(args.bench_intents, args.extra_intents)
+    else:
+        run_assistant()
\ No newline at end of file
@@ -1,108 +1,307 @@
 import speech_recognition as sr
+import argparse
+import asyncio
+import hashlib
+import itertools
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 import json
 import os
 import time
 import uuid
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 load_dotenv()
 
+# Only image generation needs the key; --batch transcription runs without it.
 MONSTER_API_KEY = os.getenv("MONSTER_API_KEY")
-if not MONSTER_API_KEY:
-    raise Exception("Missing MONSTER_API_KEY. Make sure it's in the .env file.")
 
-def transcribe_audio(audio_file):
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_file) as src:
-        audio_data = recognizer.record(src)
+# Overridable so the pipeline can run against a local stub of the API.
+MONSTER_API_URL = os.getenv("MONSTER_API_URL", "https://api.monsterapi.ai/v1")
+HEADERS = {
+    "Authorization": f"Bearer {MONSTER_API_KEY}",
+    "accept": "application/json",
+    "content-type": "application/json"
+}
+REQUEST_TIMEOUT = (3.05, 30)
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "3"))
+JOB_TIMEOUT = 150
+POLL_MIN = 1.0
+POLL_MAX = 15.0
+LISTEN_TIMEOUT = 5
+GENERATION_PARAMS = {
+    "samples": 1,
+    "steps": 40,
+    "guidance_scale": 7,
+    "safe_filter": True,
+    "style": "photographic"
+}
+# Generated images live in objects/ under their SHA-256; index/ maps a
+# normalized prompt plus its generation parameters to those hashes.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./image_cache")
+DOWNLOAD_CHUNK = 1024 * 1024
+
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def recognize_google(audio_data, source_path=None):
+    return sr.Recognizer().recognize_google(audio_data, language=None)
+
+def recognize_sidecar(audio_data, source_path=None):
+    # Local stand-in for tests: the transcript sits next to the WAV as .txt.
+    if not source_path:
+        raise sr.RequestError("the sidecar recognizer only works on files")
     try:
-        text = recognizer.recognize_google(audio_data, language=None)
+        with open(os.path.splitext(source_path)[0] + ".txt") as f:
+            text = f.read().strip()
+    except OSError as err:
+        raise sr.RequestError(str(err))
+    if not text:
+        raise sr.UnknownValueError()
+    return text
+
+RECOGNIZERS = {"google": recognize_google, "sidecar": recognize_sidecar}
+
+def transcribe_audio(audio_data, recognizer=recognize_google, source_path=None):
+    try:
+        text = recognizer(audio_data, source_path)
         return text
     except sr.UnknownValueError:
         return "Could not understand audio"
     except sr.RequestError as err:
         return f"Request Error: {err}"
 
-def generate_image(prompt):
-    url = "https://api.monsterapi.ai/v1/generate/txt2img"
-    headers = {
-        "Authorization": f"Bearer {MONSTER_API_KEY}",
-        "accept": "application/json",
-        "content-type": "application/json"
-    }
-
-    payload = {
-        "prompt": prompt,
-        "samples": 1,
-        "steps": 40,
-        "guidance_scale": 7,
-        "safe_filter": True,
-        "style": "photographic"
-    }
+def load_audio(path):
+    with sr.AudioFile(path) as src:
+        return sr.Recognizer().record(src)
 
+def submit_job(prompt, params=GENERATION_PARAMS):
+    payload = {"prompt": prompt, **params}
+    res = session.post(f"{MONSTER_API_URL}/generate/txt2img", headers=HEADERS, json=payload,
+                        timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    return res.json().get("process_id")
+
+def parse_retry_after(value):
     try:
-        res = requests.post(url, headers=headers, json=payload)
-        res.raise_for_status()
-        resp_data = res.json()
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def fetch_status(process_id):
+    res = session.get(f"{MONSTER_API_URL}/status/{process_id}", headers=HEADERS, timeout=REQUEST_TIMEOUT)
+    retry_after = parse_retry_after(res.headers.get("Retry-After"))
+    if res.status_code in (429, 503):
+        return {}, retry_after
+    res.raise_for_status()
+    return res.json(), retry_after
 
-        process_id = resp_data.get("process_id")
+def next_poll_delay(elapsed, retry_after=None, eta=None):
+    # Poll quickly while a job is young and back off as it runs longer; an
+    # ETA from the server overrides that, and Retry-After is a lower bound.
+    delay = elapsed / 4
+    if isinstance(eta, (int, float)):
+        delay = eta
+    delay = min(POLL_MAX, max(POLL_MIN, delay))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+async def generate_image(prompt, params=GENERATION_PARAMS):
+    try:
+        process_id = await asyncio.to_thread(submit_job, prompt, params)
         if not process_id:
             return None, "No process ID returned"
 
-        status_url = f"https://api.monsterapi.ai/v1/status/{process_id}"
-        for _ in range(30):
-            time.sleep(5)
-            status_res = requests.get(status_url, headers=headers)
-            status_res.raise_for_status()
-            status_data = status_res.json()
+        start = time.monotonic()
+        delay = POLL_MIN
+        while time.monotonic() - start + delay <= JOB_TIMEOUT:
+            await asyncio.sleep(delay)
+            status_data, retry_after = await asyncio.to_thread(fetch_status, process_id)
             if status_data.get("status") == "COMPLETED":
                 images = status_data.get("result", {}).get("output", [])
                 if images:
-                    return images[0], None
+                    return images, None
                 return None, "No image URL found"
             elif status_data.get("status") == "FAILED":
                 return None, f"Generation failed: {status_data.get('message', 'No details')}"
+            delay = next_poll_delay(time.monotonic() - start, retry_after, status_data.get("eta"))
         return None, "Timeout while waiting for image"
     except Exception as e:
         return None, str(e)
 
-def download_image(img_url, filename="image_out.png"):
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt.lower()).strip(" .!?")
+
+def cache_key(prompt, params):
+    keyed = {"prompt": normalize_prompt(prompt), "steps": params["steps"],
+             "guidance_scale": params["guidance_scale"], "style": params["style"],
+             "safe_filter": params["safe_filter"]}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+def object_path(digest):
+    return os.path.join(IMAGE_CACHE_DIR, "objects", digest[:2], f"{digest}.png")
+
+def cached_images(key, samples):
     try:
-        resp = requests.get(img_url, stream=True)
-        if resp.status_code == 200:
-            with open(filename, "wb") as f:
-                for chunk in resp.iter_content(1024):
+        with open(os.path.join(IMAGE_CACHE_DIR, "index", f"{key}.json")) as f:
+            digests = json.load(f)["objects"]
+    except (OSError, ValueError, KeyError):
+        return None
+    if len(digests) < samples or not all(os.path.exists(object_path(d)) for d in digests):
+        return None
+    return digests[:samples]
+
+def store_index(key, prompt, params, digests):
+    index_dir = os.path.join(IMAGE_CACHE_DIR, "index")
+    os.makedirs(index_dir, exist_ok=True)
+    temp_path = os.path.join(index_dir, f"{key}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(temp_path, "w") as f:
+        json.dump({"prompt": prompt, "params": params, "objects": digests}, f)
+    os.replace(temp_path, os.path.join(index_dir, f"{key}.json"))
+
+def download_image(img_url):
+    # Streams into the object store in 1 MiB buffered writes, hashing on the
+    # way, and returns the image's SHA-256.
+    temp_path = os.path.join(IMAGE_CACHE_DIR, "objects", f"download_{uuid.uuid4().hex}.tmp")
+    try:
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        with session.get(img_url, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+            if resp.status_code != 200:
+                return None, f"HTTP {resp.status_code}"
+            digest = hashlib.sha256()
+            with open(temp_path, "wb", buffering=DOWNLOAD_CHUNK) as f:
+                for chunk in resp.iter_content(DOWNLOAD_CHUNK):
+                    digest.update(chunk)
                     f.write(chunk)
-            return True, None
-        return False, f"HTTP {resp.status_code}"
+        path = object_path(digest.hexdigest())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return digest.hexdigest(), None
     except Exception as e:
-        return False, str(e)
+        return None, str(e)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def save_outputs(digests):
+    filenames = []
+    for digest in digests:
+        filename = f"img_{uuid.uuid4().hex[:6]}.png"
+        # A copy rather than a hard link, so editing the output cannot
+        # corrupt the cached object.
+        shutil.copyfile(object_path(digest), filename)
+        filenames.append(filename)
+    return filenames
 
 def speak(msg):
     print(f"Assistant: {msg}")
 
-def main():
-    print(">>> Speech-to-Image Tool Started <<<")
-    print("Speak something... Press Ctrl+C to quit.")
+async def produce_images(prompt, params, slots):
+    async with slots:
+        img_urls, err = await generate_image(prompt, params)
+        if not img_urls:
+            return None, f"generation failed: {err}"
+        downloads = await asyncio.gather(*(asyncio.to_thread(download_image, url) for url in img_urls))
+    failures = [download_err for digest, download_err in downloads if not digest]
+    if failures:
+        return None, f"download failed: {failures[0]}"
+    digests = [digest for digest, _ in downloads]
+    store_index(cache_key(prompt, params), prompt, params, digests)
+    return digests, None
 
-    recognizer = sr.Recognizer()
+async def run_job(job_id, prompt, slots, params=GENERATION_PARAMS, inflight=None):
+    started = time.monotonic()
+    key = cache_key(prompt, params)
+    digests = cached_images(key, params["samples"])
+    source = "cached"
+    if digests is None:
+        # A repeat of a prompt that is still generating waits for that job.
+        inflight = {} if inflight is None else inflight
+        if key not in inflight:
+            inflight[key] = asyncio.ensure_future(produce_images(prompt, params, slots))
+            inflight[key].add_done_callback(lambda _: inflight.pop(key, None))
+        digests, err = await asyncio.shield(inflight[key])
+        source = "generated"
+        if digests is None:
+            speak(f"Job {job_id}: {err}")
+            return
+    filenames = save_outputs(digests)
+    speak(f"Job {job_id}: {source} image for '{prompt}' saved as {', '.join(filenames)} "
+          f"({time.monotonic() - started:.1f}s)")
+
+def listen_once(recognizer):
+    with sr.Microphone() as mic:
+        print("\nListening...")
+        recognizer.adjust_for_ambient_noise(mic, duration=1)
+        # The timeout keeps the listening thread from outliving Ctrl+C for long.
+        audio = recognizer.listen(mic, timeout=LISTEN_TIMEOUT)
 
-    while True:
-        try:
-            with sr.Microphone() as mic:
-                print("\nListening...")
-                recognizer.adjust_for_ambient_noise(mic, duration=1)
-                audio = recognizer.listen(mic)
+    print("Transcribing speech...")
+    return transcribe_audio(audio)
 
-            temp_audio = f"temp_{uuid.uuid4().hex[:8]}.wav"
-            with open(temp_audio, "wb") as af:
-                af.write(audio.get_wav_data())
+def transcribe_file(path, recognizer):
+    started = time.monotonic()
+    record = {"file": path}
+    try:
+        text = transcribe_audio(load_audio(path), recognizer, path)
+    except (OSError, ValueError, EOFError) as err:
+        text = f"Request Error: {err}"
+    if "Could not understand" in text or "Request Error" in text:
+        record.update(ok=False, error=text)
+    else:
+        record.update(ok=True, prompt=text)
+    record["seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+def run_batch(directory, recognizer, workers):
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.lower().endswith(".wav"))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(transcribe_file, path, recognizer) for path in paths]
+        # One JSON object per line, printed as each file finishes.
+        for future in as_completed(futures):
+            print(json.dumps(future.result()), flush=True)
+
+async def main(prompts=None, max_jobs=MAX_CONCURRENT_JOBS, params=GENERATION_PARAMS):
+    if not MONSTER_API_KEY:
+        raise Exception("Missing MONSTER_API_KEY. Make sure it's in the .env file.")
+    print(">>> Speech-to-Image Tool Started <<<")
+    slots = asyncio.Semaphore(max_jobs)
+    jobs = set()
+    inflight = {}
+    job_ids = itertools.count(1)
 
-            print("Transcribing speech...")
-            spoken_text = transcribe_audio(temp_audio)
+    def start_job(prompt):
+        job_id = next(job_ids)
+        speak(f"Creating image for: '{prompt}' (job {job_id}, {len(jobs)} other job(s) pending)")
+        task = asyncio.create_task(run_job(job_id, prompt, slots, params, inflight))
+        jobs.add(task)
+        task.add_done_callback(jobs.discard)
+
+    if prompts:
+        for prompt in prompts:
+            start_job(prompt)
+        await asyncio.gather(*jobs)
+        return
+
+    print("Speak something... Press Ctrl+C to quit.")
+    recognizer = sr.Recognizer()
+    try:
+        while True:
+            try:
+                spoken_text = await asyncio.to_thread(listen_once, recognizer)
+            except sr.WaitTimeoutError:
+                continue
+            except Exception as ex:
+                speak(f"Oops! Something went wrong: {ex}")
+                continue
             print(f"You said: {spoken_text}")
-            os.remove(temp_audio)
 
             if "Could not understand" in spoken_text or "Request Error" in spoken_text:
                 speak("Sorry, couldn't get that. Try again.")
@@ -112,25 +311,36 @@ def main():
                 speak("Didn't catch any meaningful words. Try again.")
                 continue
 
-            speak(f"Creating image for: '{spoken_text}'")
-            img_url, err = generate_image(spoken_text)
-
-            if img_url:
-                filename = f"img_{uuid.uuid4().hex[:6]}.png"
-                success, download_err = download_image(img_url, filename)
-                if success:
-                    speak(f"Image saved as {filename}")
-                    print(f"URL: {img_url}")
-                else:
-                    speak(f"Download failed: {download_err}")
-            else:
-                speak(f"Generation failed: {err}")
-
-        except KeyboardInterrupt:
-            speak("Goodbye!")
-            break
-        except Exception as ex:
-            speak(f"Oops! Something went wrong: {ex}")
+            start_job(spoken_text)
+    finally:
+        if jobs:
+            speak(f"Cancelling {len(jobs)} unfinished job(s).")
+            for task in list(jobs):
+                task.cancel()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Speak a sentence, get an image.")
+    parser.add_argument('--prompt', action='append', help="generate for this prompt instead of listening (repeatable)")
+    parser.add_argument('--max-jobs', type=int, default=MAX_CONCURRENT_JOBS,
+                        help="generation jobs allowed in flight at once")
+    parser.add_argument('--samples', type=int, default=GENERATION_PARAMS["samples"], help="images per prompt")
+    parser.add_argument('--steps', type=int, default=GENERATION_PARAMS["steps"])
+    parser.add_argument('--guidance-scale', type=float, default=GENERATION_PARAMS["guidance_scale"])
+    parser.add_argument('--style', default=GENERATION_PARAMS["style"])
+    parser.add_argument('--batch', metavar='DIR', help="transcribe every .wav in DIR and print JSON lines")
+    parser.add_argument('--recognizer', choices=list(RECOGNIZERS), default="google",
+                        help="speech recognizer backend for --batch ('sidecar' reads DIR/name.txt)")
+    parser.add_argument('--workers', type=int, default=8, help="parallel transcriptions for --batch")
+    args = parser.parse_args()
+    if args.batch:
+        if not os.path.isdir(args.batch):
+            print(f"Not a directory: {args.batch}")
+            sys.exit(1)
+        run_batch(args.batch, RECOGNIZERS[args.recognizer], args.workers)
+        sys.exit(0)
+    try:
+        params = dict(GENERATION_PARAMS, samples=args.samples, steps=args.steps,
+                      guidance_scale=args.guidance_scale, style=args.style)
+        asyncio.run(main(args.prompt, args.max_jobs, params))
+    except KeyboardInterrupt:
+        speak("Goodbye!")
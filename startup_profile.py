@@ -0,0 +1,156 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# A run is timed until its script prints the milestone line, then the script
+# is killed, so the time is how long a user waits for it. '{scratch}' in args
+# and env is replaced with a temporary directory that is removed afterwards.
+# Paths under 'clean' are removed before every run, so the default slab_1-2
+# command (which caches under its working directory) is timed on a cache miss.
+targets = {
+    'slab_1-2': {'script': 'slab_1-2.py', 'args': ['--csv', '{scratch}/housing.csv'],
+                 'milestone': 'training data loaded', 'line': 'CSV file loaded successfully!', 'env': {},
+                 'cwd': '{scratch}', 'clean': ['{scratch}/housing_cache']},
+    'slab_1-2-no-cache': {'script': 'slab_1-2.py', 'args': ['--csv', '{scratch}/housing.csv', '--no-cache'],
+                          'milestone': 'training data loaded', 'line': 'CSV file loaded successfully!',
+                          'env': {}},
+    'slab_2-1': {'script': 'slab_2-1.py', 'milestone': 'first prompt',
+                 'line': 'Assistant: I am your personal assistant. How can I help you today?',
+                 'env': {'REMINDER_LOG': '{scratch}/reminders.jsonl',
+                         'WEATHER_URL': 'http://127.0.0.1:9/', 'NEWS_URL': 'http://127.0.0.1:9/'}},
+    'salb_2-3': {'script': 'salb_2-3.py', 'milestone': 'first prompt', 'line': "Type 'exit' to quit.",
+                 'env': {'API_KEY_GEMINI': 'startup-profile', 'GOOGLE_CSE_API_KEY': 'startup-profile',
+                         'GOOGLE_CSE_CX': 'startup-profile',
+                         'SEARCH_CACHE_PATH': '{scratch}/search_cache.sqlite3'}},
+}
+
+
+def write_housing_csv(path, rows=2000, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Id', 'LotArea', 'GrLivArea', 'OverallQual', 'Neighborhood', 'SalePrice'])
+        for i in range(rows):
+            area = rng.randint(600, 3000)
+            writer.writerow([i + 1, rng.randint(2000, 20000), area, rng.randint(1, 10),
+                             f'Neighborhood{rng.randint(0, 24):02d}', area * 70 + rng.randint(0, 50000)])
+
+
+def run_script(script, args, env, line, stderr_path, importtime=False, cwd=None, clean=()):
+    # Returns the seconds until `line` was printed, or None if the script
+    # exited first. stderr goes to a file: -X importtime writes far more than
+    # a pipe holds while nobody is reading it.
+    for path in clean:
+        shutil.rmtree(path, ignore_errors=True)
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [script] + args
+    with open(stderr_path, 'w') as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, env=env, cwd=cwd, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=stderr, text=True)
+        elapsed = None
+        for output in proc.stdout:
+            if output.strip() == line:
+                elapsed = time.perf_counter() - start
+                break
+        proc.kill()
+        proc.stdout.close()
+        proc.wait()
+    with open(stderr_path) as f:
+        return elapsed, proc.returncode, f.read()
+
+
+def parse_importtime(stderr, top=10):
+    # Lines look like "import time:   self [us] | cumulative | imported package";
+    # top-level imports are the ones with no indentation in the package column.
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative_us) / 1e6))
+    total = sum(seconds for _, seconds in imports)
+    imports.sort(key=lambda item: -item[1])
+    return total, [{'module': name, 'cumulative_s': round(seconds, 4)} for name, seconds in imports[:top]]
+
+
+def profile(name, runs, scratch_dir):
+    target = targets[name]
+    env = {key: value.format(scratch=scratch_dir) for key, value in target['env'].items()}
+    env = dict(os.environ, PYTHONUNBUFFERED='1', **env)
+    args = [arg.format(scratch=scratch_dir) for arg in target.get('args', [])]
+    cwd = target['cwd'].format(scratch=scratch_dir) if 'cwd' in target else None
+    clean = [path.format(scratch=scratch_dir) for path in target.get('clean', [])]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), target['script'])
+    stderr_path = os.path.join(scratch_dir, f'{name}.stderr')
+    times = []
+    for _ in range(runs):
+        elapsed, returncode, stderr = run_script(script, args, env, target['line'], stderr_path,
+                                                 cwd=cwd, clean=clean)
+        if elapsed is None:
+            return {'error': stderr.strip().splitlines()[-1] if stderr.strip() else
+                    f"exited with status {returncode} before the {target['milestone']}"}
+        times.append(elapsed)
+    _, _, stderr = run_script(script, args, env, target['line'], stderr_path, importtime=True,
+                              cwd=cwd, clean=clean)
+    import_s, top_imports = parse_importtime(stderr)
+    return {
+        'milestone': target['milestone'],
+        'ready_s': round(statistics.median(times), 4),
+        'min_s': round(min(times), 4),
+        'runs': runs,
+        'import_s': round(import_s, 4),
+        'top_imports': top_imports,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long each script takes to become ready, "
+                                                 "and what it imports on the way.")
+    parser.add_argument('scripts', nargs='*', metavar='SCRIPT',
+                        help=f"scripts to profile: {', '.join(targets)} (default: all)")
+    parser.add_argument('--runs', type=int, default=5, help="timed runs per script; the median is reported")
+    parser.add_argument('--out', default='startup_profile.json', help="where to write the JSON report")
+    parser.add_argument('--baseline', help="earlier report to compare against")
+    args = parser.parse_args()
+    unknown = [name for name in args.scripts if name not in targets]
+    if unknown:
+        parser.error(f"unknown script: {', '.join(unknown)}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['scripts']
+
+    report = {'python': platform.python_version(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'scripts': {}}
+    print(f"{'script':>17} {'milestone':>21} {'ready':>8} {'imports':>9} {'baseline':>9}  slowest import")
+    with tempfile.TemporaryDirectory(prefix='startup-profile-') as scratch_dir:
+        write_housing_csv(os.path.join(scratch_dir, 'housing.csv'))
+        for name in args.scripts or targets:
+            result = profile(name, args.runs, scratch_dir)
+            report['scripts'][name] = result
+            if 'error' in result:
+                print(f"{name:>17} error: {result['error']}")
+                continue
+            before = baseline.get(name, {}).get('ready_s')
+            before_s = f"{before:>8.3f}s" if before else f"{'-':>9}"
+            slowest = result['top_imports'][0] if result['top_imports'] else {'module': '-', 'cumulative_s': 0}
+            print(f"{name:>17} {result['milestone']:>21} {result['ready_s']:>7.3f}s {result['import_s']:>8.3f}s "
+                  f"{before_s}  {slowest['module']} ({slowest['cumulative_s']:.3f}s)")
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()